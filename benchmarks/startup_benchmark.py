@@ -0,0 +1,132 @@
+"""
+Cold-start time and memory of each page of the Streamlit app.
+
+Every measurement runs in a fresh Python process, which renders one page once with
+Streamlit's AppTest harness (no server or browser), so import costs are not hidden by
+modules an earlier page already loaded. For each page it reports:
+
+- wall_s: process start to first render finished (interpreter start-up included)
+- render_s: time spent importing and running the app script inside that process
+- peak_rss_mb: peak resident memory of the process
+- heavy_modules: which of the expensive libraries the page ended up importing
+
+    python benchmarks/startup_benchmark.py
+    python benchmarks/startup_benchmark.py --repeat 5 --json startup.json
+    python benchmarks/startup_benchmark.py --budget-s 3 --budget-mb 400   # exit 1 if exceeded
+
+Runs in a temporary working directory so the app's workspace folders are not created
+in the repository.
+"""
+import argparse
+import importlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+APP_SCRIPT = REPO_ROOT / "streamlit_app.py"
+PAGES = ("T2DM Docking", "T2DM AI prediction", "About")
+# Bare `import streamlit`: the floor every page pays.
+BASELINE = "(streamlit only)"
+HEAVY_MODULES = (
+    "pandas", "numpy", "rdkit", "meeko", "molscrub", "plotly", "py3Dmol", "stmol",
+    "streamlit_ketcher", "joblib", "sklearn", "xgboost", "requests",
+)
+
+
+def _measure_in_this_process(page):
+    """Child side: render `page` once and return the measurements as a dict."""
+    import resource
+
+    start = time.perf_counter()
+    importlib.import_module("streamlit")
+    error = None
+    if page != BASELINE:
+        from streamlit.testing.v1 import AppTest
+
+        app = AppTest.from_file(str(APP_SCRIPT), default_timeout=120)
+        app.session_state["app_mode"] = page
+        app.run()
+        if app.exception:
+            error = app.exception[0].message
+    render_s = time.perf_counter() - start
+    return {
+        "render_s": render_s,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "heavy_modules": [m for m in HEAVY_MODULES if m in sys.modules],
+        "error": error,
+    }
+
+
+def measure(page, workdir):
+    """Runs one cold start of `page` in a subprocess and returns its measurements."""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(REPO_ROOT), os.environ.get("PYTHONPATH")]))}
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, str(Path(__file__).resolve()), "--child", page],
+        cwd=workdir, env=env, capture_output=True, text=True
+    )
+    wall_s = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"{page}: benchmark process failed:\n{proc.stderr}")
+    return {"wall_s": wall_s, **json.loads(proc.stdout.strip().splitlines()[-1])}
+
+
+def run_benchmark(pages, repeat):
+    results = []
+    with tempfile.TemporaryDirectory(prefix="startup_bench_") as workdir:
+        for page in pages:
+            runs = [measure(page, workdir) for _ in range(repeat)]
+            results.append({
+                "page": page,
+                "wall_s": statistics.median(r["wall_s"] for r in runs),
+                "render_s": statistics.median(r["render_s"] for r in runs),
+                "peak_rss_mb": max(r["peak_rss_mb"] for r in runs),
+                "heavy_modules": runs[-1]["heavy_modules"],
+                "error": next((r["error"] for r in runs if r["error"]), None),
+            })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", nargs="+", default=[BASELINE, *PAGES], help="Pages to measure (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="Cold starts per page; the median time is reported")
+    parser.add_argument("--json", default=None, help="Also write the results to this JSON file")
+    parser.add_argument("--budget-s", type=float, default=None, help="Fail if any page's median wall time exceeds this")
+    parser.add_argument("--budget-mb", type=float, default=None, help="Fail if any page's peak RSS exceeds this")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child is not None:
+        print(json.dumps(_measure_in_this_process(args.child)))
+        return 0
+
+    results = run_benchmark(args.pages, max(1, args.repeat))
+    print(f"{'page':<22} {'wall_s':>7} {'render_s':>8} {'rss_mb':>7}  heavy modules")
+    for r in results:
+        print(f"{r['page']:<22} {r['wall_s']:>7.2f} {r['render_s']:>8.2f} {r['peak_rss_mb']:>7.0f}  {', '.join(r['heavy_modules']) or '-'}")
+        if r["error"]:
+            print(f"  ! {r['page']} raised: {r['error']}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=1)
+
+    over_budget = [
+        r["page"] for r in results
+        if (args.budget_s is not None and r["wall_s"] > args.budget_s)
+        or (args.budget_mb is not None and r["peak_rss_mb"] > args.budget_mb)
+    ]
+    if over_budget:
+        print(f"Over budget: {', '.join(over_budget)}", file=sys.stderr)
+        return 1
+    return 1 if any(r["error"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
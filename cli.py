@@ -0,0 +1,289 @@
+"""
+Headless command-line entry point for batch schedulers (no Streamlit import).
+
+    python cli.py prepare library.smi --output prepared.csv
+    python cli.py dock library.smi --targets dpp4 sglt2 --output docking.csv
+    python cli.py predict library.smi --models DPP-4 dppiv --output predictions.json
+    python cli.py catalog
+
+Runs the same ligand preparation, docking (result cache, affinity maps, journal,
+results store) and ML prediction code as the app. Tables are written as CSV, JSON or
+JSON Lines depending on the `--output` extension (CSV on stdout by default); progress
+goes to stderr.
+
+Models, receptors, configs, Vina and the data directories are found relative to this
+file, so the CLI can be run from any directory; set GSJ_APP_ROOT to use another root.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from pathlib import Path
+
+# Must be set before utils.paths is imported: every default path is derived from it
+os.environ.setdefault("GSJ_APP_ROOT", str(Path(__file__).resolve().parent))
+
+from utils.paths import (
+    VINA_PATH_LOCAL, LIGAND_PREP_DIR_LOCAL, DOCKING_OUTPUT_DIR_LOCAL,
+    DOCKING_CACHE_DIR_LOCAL, DOCKING_CACHE_MAX_BYTES, MAPS_DIR_LOCAL,
+    FINGERPRINT_STORE_PATH, RESULTS_DB_PATH, SCREENING_JOURNAL_DIR_LOCAL
+)
+from utils.catalog import (
+    DIABETES_TARGETS, ML_MODELS_CONFIG, find_target, find_model,
+    fetch_targets, fetch_model_file, docking_output_filename
+)
+from utils.docking import available_cpu_count, config_exhaustiveness
+
+SMILES_LIBRARY_SUFFIXES = (".smi", ".csv", ".txt")
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def write_table(rows, output):
+    """Writes a list of dicts as CSV, JSON (`.json`) or JSON Lines (`.jsonl`); `-` is CSV on stdout."""
+    fieldnames = list(dict.fromkeys(key for row in rows for key in row))
+    suffix = Path(output).suffix.lower() if output != "-" else ".csv"
+    f = sys.stdout if output == "-" else open(output, 'w', newline='', encoding='utf-8')
+    try:
+        if suffix == ".json":
+            json.dump(rows, f, indent=1)
+            f.write("\n")
+        elif suffix == ".jsonl":
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+        else:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+    finally:
+        if f is not sys.stdout:
+            f.close()
+
+
+def iter_library(path):
+    """Yields `(name, smiles)` records from a .smi/.csv library (a .txt file is read as .smi), one at a time."""
+    from utils.library_prep import read_smiles_library
+
+    with open(path, 'r', encoding='utf-8') as f:
+        yield from read_smiles_library(f, path)
+
+
+def read_library(path):
+    """All `(name, smiles)` records of a library, as a list."""
+    return list(iter_library(path))
+
+
+def prepare_records(records, output_dir, args):
+    """Prepares library records (streamed) in parallel, logging progress. Returns the per-molecule result dicts."""
+    from utils.library_prep import prepare_library
+
+    n_workers = args.workers or available_cpu_count()
+    results = []
+    n_failed = 0
+    for done, result in enumerate(prepare_library(
+        records, output_dir, n_workers, ph=args.ph, skip_tautomers=args.skip_tautomers,
+        skip_acidbase=args.skip_acidbase, skip_existing=not args.overwrite, dedupe=not args.keep_duplicates
+    ), start=1):
+        results.append(result)
+        n_failed += bool(result["error"])
+        if done % 100 == 0:
+            log(f"Prepared {done} molecules ({n_failed} failed) on {n_workers} worker(s)")
+    log(f"Prepared {len(results)} molecules ({n_failed} failed) on {n_workers} worker(s)")
+    return results
+
+
+def cmd_prepare(args):
+    results = prepare_records(iter_library(args.library), Path(args.ligand_dir), args)
+    write_table([
+        {"name": r["name"], "smiles": r["smiles"], "pdbqt_path": r["pdbqt_path"] or "", "error": r["error"] or "",
+         "duplicate_of": r["duplicate_of"] or ""}
+        for r in results
+    ], args.output)
+    return 1 if results and all(r["error"] for r in results) else 0
+
+
+def collect_ligands(inputs, args):
+    """Resolves `dock` inputs (.pdbqt files, directories of them, SMILES libraries) to PDBQT paths."""
+    ligand_paths = []
+    for item in map(Path, inputs):
+        if item.is_dir():
+            ligand_paths += sorted(item.glob("*.pdbqt"))
+        elif item.suffix.lower() == ".pdbqt":
+            ligand_paths.append(item)
+        elif item.suffix.lower() in SMILES_LIBRARY_SUFFIXES:
+            results = prepare_records(iter_library(item), Path(args.ligand_dir), args)
+            for r in results:
+                if r["error"]: log(f"Skipping {r['name']}: {r['error']}")
+            ligand_paths += [Path(r["pdbqt_path"]) for r in results if r["pdbqt_path"]]
+        else:
+            raise ValueError(f"{item}: expected a .pdbqt file, a directory or a {'/'.join(SMILES_LIBRARY_SUFFIXES)} library")
+    # One job per ligand name: the output files are named after it
+    by_name = {}
+    for path in ligand_paths:
+        other = by_name.setdefault(path.stem, path)
+        if other.resolve() != path.resolve():
+            raise ValueError(f"two ligands are named '{path.stem}' ({other} and {path}); output files are named after the ligand, so rename one")
+    return list(by_name.values())
+
+
+def cmd_dock(args):
+    from utils.docking_cache import DockingResultCache
+    from utils.results_store import ResultsStore
+    from utils.screening import run_screening
+    from utils.screening_journal import ScreeningJournal, screening_run_key
+
+    targets = [find_target(name) for name in args.targets]
+    ligand_paths = collect_ligands(args.ligands, args)
+    if not ligand_paths:
+        log("No ligands to dock.")
+        return 1
+
+    target_paths = fetch_targets(targets)
+    output_dir = Path(args.out_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    jobs = [
+        {
+            "ligand_name": lig_path.stem, "target_name": t,
+            "receptor_path": target_paths[t][0], "ligand_path": lig_path, "config_path": target_paths[t][1],
+            "output_path": output_dir / docking_output_filename(lig_path.stem, t)
+        }
+        for lig_path in ligand_paths for t in targets
+    ]
+    exhaustiveness = max(config_exhaustiveness(c_path) for _, c_path in target_paths.values())
+    run_key = screening_run_key(jobs, {"maps": not args.no_maps})
+    results_store = ResultsStore(RESULTS_DB_PATH)
+    ligand_names = [path.stem for path in ligand_paths]
+    run_id = results_store.start_run(ligand_names, targets, label=args.label, run_id=None if args.no_resume else run_key)
+    log(f"Run {run_id}: docking {len(ligand_names)} ligand(s) against {len(targets)} target(s)")
+
+    def show_plan(n_workers, cpu_per_job, n_to_dock):
+        log(f"Docking {n_to_dock} pair(s) on {n_workers} parallel Vina process(es) with {cpu_per_job} CPU(s) each")
+
+    scores = {}
+    with ScreeningJournal(SCREENING_JOURNAL_DIR_LOCAL, run_key) as journal:
+        if args.no_resume:
+            journal.reset()
+        for done, (job, score, source) in enumerate(run_screening(
+            jobs, args.vina, exhaustiveness, batch_mode=not args.no_batch,
+            cache=None if args.no_cache else DockingResultCache(DOCKING_CACHE_DIR_LOCAL, DOCKING_CACHE_MAX_BYTES),
+            on_plan=show_plan, maps_dir=None if args.no_maps else MAPS_DIR_LOCAL,
+            journal=journal, total_cpus=args.cpus, dedupe=not args.keep_duplicates
+        ), start=1):
+            scores[job["ligand_name"], job["target_name"]] = (score, source, job["output_path"])
+            if source != "journal":
+                results_store.record_result(
+                    run_id, job["ligand_name"], job["target_name"], score, job["output_path"],
+                    elapsed_s=job.get("elapsed_s") if source == "vina" else 0.0, from_cache=source == "cache"
+                )
+            log(f"[{done}/{len(jobs)}] {job['ligand_name']} vs {job['target_name']}: {score} ({source})")
+    results_store.finish_run(run_id)
+
+    if args.long:
+        rows = [
+            {"run_id": run_id, "ligand": lig, "target": t, "score": scores[lig, t][0],
+             "source": scores[lig, t][1], "output_path": str(scores[lig, t][2])}
+            for lig in ligand_names for t in targets
+        ]
+    else:
+        rows = [{"Ligand": lig, **{t: scores[lig, t][0] for t in targets}} for lig in ligand_names]
+    write_table(rows, args.output)
+    n_errors = sum(1 for score, _, _ in scores.values() if score == "Error")
+    if n_errors:
+        log(f"{n_errors} of {len(jobs)} pair(s) failed.")
+    return 1 if n_errors == len(jobs) else 0
+
+
+def cmd_predict(args):
+    from utils.fingerprint_store import FingerprintStore
+    from utils.ml_prediction import predict_smiles_table
+    from utils.model_registry import get_model
+
+    model_names = [find_model(name) for name in args.models]
+    records = read_library(args.library)
+    models = {name: get_model(fetch_model_file(name)) for name in model_names}
+    log(f"Predicting {len(records)} molecule(s) with {len(models)} model(s)")
+    rows, invalid = predict_smiles_table(
+        [smiles for _, smiles in records], models, store=FingerprintStore(FINGERPRINT_STORE_PATH),
+        ids=[name for name, _ in records], n_workers=available_cpu_count()
+    )
+    if invalid:
+        log(f"Skipped {len(invalid)} invalid SMILES.")
+    write_table(rows, args.output)
+    return 1 if records and not rows else 0
+
+
+def cmd_catalog(args):
+    rows = [
+        {"kind": "target", "name": name, "alias": Path(info["pdbqt"]).stem, "files": f"{info['pdbqt']} {info['config']}"}
+        for name, info in DIABETES_TARGETS.items()
+    ] + [
+        {"kind": "model", "name": name, "alias": Path(filename).stem, "files": filename}
+        for name, filename in ML_MODELS_CONFIG.items()
+    ]
+    write_table(rows, args.output)
+    return 0
+
+
+def add_prep_options(parser):
+    group = parser.add_argument_group("ligand preparation")
+    group.add_argument("--ligand-dir", default=str(LIGAND_PREP_DIR_LOCAL), help="Where prepared PDBQT files are written (default: %(default)s)")
+    group.add_argument("--ph", type=float, default=7.4, help="Protonation pH (default: %(default)s)")
+    group.add_argument("--skip-tautomers", action="store_true", help="Do not enumerate tautomers")
+    group.add_argument("--skip-acidbase", action="store_true", help="Do not enumerate protonation states")
+    group.add_argument("--workers", type=int, default=None, help="Preparation processes (default: all CPUs)")
+    group.add_argument("--overwrite", action="store_true", help="Re-prepare ligands whose PDBQT already exists")
+    group.add_argument("--keep-duplicates", action="store_true", help="Prepare and dock every record, even if it repeats an earlier compound")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Headless T2DM docking and activity prediction.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    p = subparsers.add_parser("prepare", help="Prepare a SMILES library (.smi/.csv) as docking-ready PDBQT files")
+    p.add_argument("library", help="SMILES library (.smi/.csv)")
+    p.add_argument("--output", "-o", default="-", help="Report table (.csv/.json/.jsonl, default: CSV on stdout)")
+    add_prep_options(p)
+    p.set_defaults(func=cmd_prepare)
+
+    p = subparsers.add_parser("dock", help="Dock ligands against catalog targets")
+    p.add_argument("ligands", nargs="+", help=".pdbqt files, directories of .pdbqt files, or SMILES libraries")
+    p.add_argument("--targets", "-t", nargs="+", required=True, help="Target names or aliases (see `catalog`)")
+    p.add_argument("--output", "-o", default="-", help="Score table (.csv/.json/.jsonl, default: CSV on stdout)")
+    p.add_argument("--long", action="store_true", help="One row per (ligand, target) with source and pose file")
+    p.add_argument("--out-dir", default=str(DOCKING_OUTPUT_DIR_LOCAL), help="Where Vina poses are written (default: %(default)s)")
+    p.add_argument("--vina", default=str(VINA_PATH_LOCAL), help="Vina executable (default: %(default)s)")
+    p.add_argument("--cpus", type=int, default=None, help="CPUs Vina may use in total (default: all)")
+    p.add_argument("--label", default=None, help="Label stored with the run in the results database")
+    p.add_argument("--no-batch", action="store_true", help="One Vina process per pair instead of per target batch")
+    p.add_argument("--no-cache", action="store_true", help="Do not reuse or store cached results")
+    p.add_argument("--no-maps", action="store_true", help="Do not use precomputed affinity maps")
+    p.add_argument("--no-resume", action="store_true", help="Ignore the checkpoint of an interrupted identical run")
+    add_prep_options(p)
+    p.set_defaults(func=cmd_dock)
+
+    p = subparsers.add_parser("predict", help="Predict activity of a SMILES library with catalog models")
+    p.add_argument("library", help="SMILES library (.smi/.csv)")
+    p.add_argument("--models", "-m", nargs="+", default=list(ML_MODELS_CONFIG), help="Model names or aliases (default: all)")
+    p.add_argument("--output", "-o", default="-", help="Prediction table (.csv/.json/.jsonl, default: CSV on stdout)")
+    p.set_defaults(func=cmd_predict)
+
+    p = subparsers.add_parser("catalog", help="List the available targets and models")
+    p.add_argument("--output", "-o", default="-", help="Table (.csv/.json/.jsonl, default: CSV on stdout)")
+    p.set_defaults(func=cmd_catalog)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        return args.func(args)
+    except (KeyError, ValueError, OSError) as e:
+        parser.exit(2, f"error: {e.args[0] if isinstance(e, KeyError) else e}\n")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
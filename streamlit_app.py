@@ -1,213 +1,161 @@
-import re
+import io
+import time
+import uuid
 import streamlit as st
-import subprocess
-import os
-import zipfile
-import shutil
 from pathlib import Path
-import pandas as pd
-import numpy as np
-import joblib
-from rdkit import Chem
-from rdkit.Chem import AllChem
-from streamlit_ketcher import st_ketcher # For drawing molecules
-import plotly.express as px
-import py3Dmol
-from stmol import showmol
-from meeko import MoleculePreparation, PDBQTMolecule # FIX: Added PDBQTMolecule for reading
+
+# Heavy libraries (pandas, rdkit, meeko, plotly, py3Dmol, stmol, streamlit_ketcher and the
+# utils modules that pull in numpy/rdkit) are imported inside the page or feature that
+# uses them, so a cold start and light pages like About do not pay for all of them.
+# benchmarks/startup_benchmark.py tracks the cost per page.
 
 # Giữ lại các import từ file utils cục bộ để tận dụng cấu trúc hiện có
 # Lưu ý: Vì logic đơn giản hóa, ta sẽ không dùng hết tất cả biến, nhưng giữ lại import để tránh lỗi
 from utils.paths import (
-    APP_VERSION, BASE_GITHUB_URL_FOR_DATA, 
-    APP_ROOT, VINA_EXECUTABLE_NAME, VINA_PATH_LOCAL,
+    APP_VERSION,
+    VINA_PATH_LOCAL,
     RECEPTOR_DIR_LOCAL, CONFIG_DIR_LOCAL,
-    LIGAND_PREP_DIR_LOCAL, LIGAND_UPLOAD_TEMP_DIR, ZIP_EXTRACT_DIR_LOCAL,
-    DOCKING_OUTPUT_DIR_LOCAL, WORKSPACE_PARENT_DIR,
-    SCRUB_PY_LOCAL_PATH, MK_PREPARE_LIGAND_PY_LOCAL_PATH
+    SESSION_WORKSPACES_DIR_LOCAL, WORKSPACES_MAX_BYTES, WORKSPACE_MIN_IDLE_S,
+    SCRUB_PY_LOCAL_PATH, MK_PREPARE_LIGAND_PY_LOCAL_PATH,
+    DOCKING_CACHE_DIR_LOCAL, DOCKING_CACHE_MAX_BYTES, MAPS_DIR_LOCAL,
+    FINGERPRINT_STORE_PATH, RESULTS_DB_PATH, SCREENING_JOURNAL_DIR_LOCAL,
+    JOBS_DIR_LOCAL, JOB_WORKERS
 )
 from utils.app_utils import (
-    initialize_directories, download_file_from_github, 
+    initialize_directories,
     check_vina_binary, convert_df_to_csv,
     standardize_smiles_rdkit, convert_smiles_to_pdbqt
 )
+from utils.docking import config_exhaustiveness, available_cpu_count
+from utils.docking_cache import DockingResultCache
+from utils.screening_journal import ScreeningJournal, screening_run_key
+from utils.model_registry import get_model, warm_up_in_background
+from utils.jobs import JobManager, QUEUED, RUNNING, DONE
+from utils.catalog import (
+    DIABETES_TARGETS, ML_MODELS_CONFIG, docking_output_filename, model_path,
+    get_asset_manager, target_assets, fetch_model_file
+)
 
-# --- CẤU HÌNH CÁC MỤC TIÊU TIỂU ĐƯỜNG ---
-# Giả định các file này nằm trong thư mục 'receptors' và 'configs' trên GitHub
-# Bạn cần đảm bảo tên file trên GitHub khớp với định nghĩa ở đây.
-DIABETES_TARGETS = {
-    "DPP-4 (4A5S)": {
-        "pdbqt": "dpp4.pdbqt",
-        "config": "dpp4.txt"
-    },
-    "GLP1-R (6X19)": {
-        "pdbqt": "glp1r.pdbqt",
-        "config": "glp1r.txt"
-    },
-    "PPAR-γ (5Y2O)": {
-        "pdbqt": "pparg.pdbqt",
-        "config": "pparg.txt"
-    },
-    "SGLT2 (8HEZ)": {
-        "pdbqt": "sglt2.pdbqt",
-        "config": "sglt2.txt"
-    },
-    "SUR1 (7S5V)": {
-        "pdbqt": "sur1.pdbqt",
-        "config": "sur1.txt"
-    }
-}
-
-# Define ML Models (Ensure these exist in your GitHub 'models/' folder)
-ML_MODELS_CONFIG = {
-    "DPP-4": "dppiv.pkl",
-    "PPAR-γ": "pparg.pkl",
-    "GLP1-R": "glp1r.pkl"
-}
-
-MODELS_DIR_LOCAL = APP_ROOT / "models"
-
-def load_ml_model(target_name):
-    """Downloads and loads the .pkl model for the specific target."""
-    MODELS_DIR_LOCAL.mkdir(parents=True, exist_ok=True)
-    model_filename = ML_MODELS_CONFIG.get(target_name)
-    if not model_filename:
+@st.cache_resource
+def get_docking_cache():
+    """Process-wide docking result cache shared by all sessions."""
+    return DockingResultCache(DOCKING_CACHE_DIR_LOCAL, DOCKING_CACHE_MAX_BYTES)
+
+@st.cache_resource
+def get_results_store():
+    """Process-wide SQLite store of docking runs shared by all sessions."""
+    from utils.results_store import ResultsStore
+    return ResultsStore(RESULTS_DB_PATH)
+
+@st.cache_resource
+def get_fingerprint_store():
+    """Process-wide on-disk ECFP4 store shared by all sessions."""
+    from utils.fingerprint_store import FingerprintStore
+    return FingerprintStore(FINGERPRINT_STORE_PATH)
+
+@st.cache_resource
+def get_workspace_manager():
+    """Process-wide manager of the per-session workspaces; evicts idle ones in the background."""
+    from utils.workspace import WorkspaceManager
+    return WorkspaceManager(SESSION_WORKSPACES_DIR_LOCAL, WORKSPACES_MAX_BYTES, WORKSPACE_MIN_IDLE_S)
+
+def get_session_workspace():
+    """This session's private directory for prepared ligands and docking outputs."""
+    if "workspace_id" not in st.session_state:
+        st.session_state.workspace_id = uuid.uuid4().hex[:12]
+    return get_workspace_manager().get(st.session_state.workspace_id)
+
+@st.cache_resource
+def get_job_manager():
+    """Process-wide background job queue shared by all sessions."""
+    return JobManager(JOBS_DIR_LOCAL, JOB_WORKERS)
+
+@st.cache_resource
+def start_model_warm_up():
+    """Loads the bundled activity models in the background once per server process."""
+    return warm_up_in_background(model_path(name) for name in ML_MODELS_CONFIG)
+
+def display_jobs_panel(kind):
+    """
+    Lists this session's background jobs of `kind` with their progress.
+    Returns the result of the job whose "Load results" button was pressed, if any.
+    """
+    if not st.session_state.get("job_ids"):
+        return None
+    statuses = get_job_manager().list_jobs(st.session_state.job_ids, kind=kind)
+    if not statuses:
+        return None
+    loaded = None
+    with st.expander(f"⏳ Background jobs ({len(statuses)})", expanded=True):
+        st.button("Refresh", key=f"refresh_jobs_{kind}")
+        for status in statuses:
+            submitted = time.strftime("%Y-%m-%d %H:%M", time.localtime(status["submitted_at"]))
+            st.markdown(f"**{status.get('label') or status['job_id']}** — {submitted} — `{status['state']}`")
+            if status["state"] in (QUEUED, RUNNING):
+                st.progress(status.get("progress", 0.0))
+                st.caption(status.get("message", ""))
+            elif status["state"] == DONE:
+                if st.button("Load results", key=f"load_job_{status['job_id']}"):
+                    loaded = get_job_manager().get_result(status["job_id"])
+            else:
+                st.caption(status.get("error") or status.get("message", ""))
+    return loaded
+
+def submit_background_job(kind, spec, label):
+    """Queues a job and remembers its id in this session."""
+    job_id = get_job_manager().submit(kind, spec, label=label)
+    st.session_state.setdefault("job_ids", []).append(job_id)
+    st.success(f"Queued background job {job_id}. Track it under 'Background jobs'; you can keep using the app meanwhile.")
+    return job_id
+
+def ensure_ml_model_file(target_name):
+    """Fetches the .pkl model for the specific target (only if missing or outdated) and returns its path."""
+    if target_name not in ML_MODELS_CONFIG:
         return None
-    
-    local_path = MODELS_DIR_LOCAL / model_filename
-    
-    # Download if not exists
-    if not local_path.exists():
-        with st.spinner(f"Downloading model for {target_name}..."):
-            # Assuming models are in a 'models' folder in the repo
-            download_file_from_github(BASE_GITHUB_URL_FOR_DATA, f"models/{model_filename}", model_filename, MODELS_DIR_LOCAL)
-    
-    if local_path.exists():
-        try:
-            return joblib.load(local_path)
-        except Exception as e:
-            st.error(f"Error loading model {model_filename}: {e}")
-            return None
-    return None
-
-def calculate_ecfp4(smiles):
-    """Calculates ECFP4 fingerprint (2048 bits) from SMILES."""
     try:
-        mol = Chem.MolFromSmiles(smiles)
-        if mol:
-            fp = AllChem.GetMorganFingerprintAsBitVect(mol, 2, nBits=2048)
-            return np.array(fp)
-    except:
+        with st.spinner(f"Checking model for {target_name}..."):
+            return fetch_model_file(target_name)
+    except OSError as e:
+        st.error(str(e))
         return None
-    return None
 
-def convert_pdbqt_to_pdb(pdbqt_path, output_pdb_path):
-    """
-    Extracts the first pose from a PDBQT file and converts it to PDB format
-    by stripping AutoDock-specific columns (Charge/AtomType).
-    """
+def load_ml_model(target_name):
+    """Fetches (only if missing or outdated) and loads the .pkl model for the specific target."""
+    local_path = ensure_ml_model_file(target_name)
+    if local_path is None:
+        return None
     try:
-        with open(pdbqt_path, 'r') as f:
-            lines = f.readlines()
-        
-        pdb_lines = []
-        in_model = False
-        model_found = False
-        
-        for line in lines:
-            # Handle Models: Only take the first one
-            if line.startswith("MODEL"):
-                in_model = True
-                model_found = True
-                continue
-            if line.startswith("ENDMDL"):
-                break 
-            
-            # Process ATOM/HETATM lines
-            if line.startswith("ATOM") or line.startswith("HETATM"):
-                # PDBQT format extends PDB columns. 
-                # Standard PDB lines are usually ~80 chars. 
-                # AutoDock adds charge/type info after column 66.
-                # We slice up to column 66 to make it a valid PDB line, 
-                # preserving coordinates (30-54) and occupancy/b-factor if present.
-                # We can also explicitly reset Occupancy(55-60) and B-Factor(61-66) to 1.00/0.00 if needed,
-                # but simple slicing is usually sufficient for visualization.
-                clean_line = line[:66] + "\n"
-                pdb_lines.append(clean_line)
-            elif not model_found and not line.startswith("TORSDOF"): 
-                # Keep header lines if they exist before MODEL
-                pdb_lines.append(line)
-
-        # Write to PDB file
-        with open(output_pdb_path, 'w') as f:
-            f.writelines(pdb_lines)
-            
-        return True
-            
+        return get_model(local_path)
     except Exception as e:
-        print(f"PDB Conversion Error: {e}")
-        return False
+        st.error(f"Error loading model {local_path.name}: {e}")
+        return None
 
-def parse_vina_score_from_file(file_path):
-    """
-    Hàm đọc file output PDBQT và lấy điểm năng lượng liên kết thấp nhất (best affinity).
-    """
-    best_affinity = None
-    try:
-        with open(file_path, 'r') as f:
-            for line in f:
-                if line.startswith('REMARK VINA RESULT'):
-                    parts = line.split()
-                    # Định dạng thường là: REMARK VINA RESULT: -9.5 0.000 0.000
-                    if len(parts) >= 4:
-                        best_affinity = float(parts[3])
-                    break
-    except Exception:
-        pass
-    return best_affinity
-
-def run_single_docking(vina_path, receptor_path, ligand_path, config_path, output_path):
-    """
-    Hàm chạy Vina cho 1 cặp Receptor - Ligand.
-    """
-    cmd = [
-        str(vina_path),
-        "--receptor", str(receptor_path),
-        "--ligand", str(ligand_path),
-        "--config", str(config_path),
-        "--out", str(output_path),
-        "--cpu", "2" # Sử dụng 2 CPU cho mỗi tác vụ để cân bằng
-    ]
-    
-    # Chạy lệnh
-    proc = subprocess.run(cmd, capture_output=True, text=True)
-    return proc.returncode, proc.stdout, proc.stderr
-    
-def view_complex(protein_path, ligand_path):
+def view_complex(protein_data, ligand_data, ligand_format="pdb", pocket_only=False):
     """
-    Generates a 3D visualization. Detects format based on extension.
+    Generates a 3D visualization from receptor and ligand text. With `pocket_only`, the
+    receptor is a set of binding-site residues and is drawn as sticks over the cartoon.
     """
-    try:
-        with open(protein_path, 'r') as f: protein_data = f.read()
-        with open(ligand_path, 'r') as f: ligand_data = f.read()
-        
-        # Detect ligand format (pdbqt, sdf, mol2)
-        ligand_format = Path(ligand_path).suffix.strip('.').lower()
+    import py3Dmol
+    from stmol import showmol
 
-        view = py3Dmol.view(width=800, height=500)
-        view.addModelsAsFrames(protein_data)
-        view.setStyle({'model': -1}, {"cartoon": {'color': 'spectrum'}})
-        
-        # Add ligand with correct format
-        view.addModel(ligand_data, ligand_format)
-        view.setStyle({'model': -1}, {"stick": {'colorscheme': 'greenCarbon'}})
-        
-        view.zoomTo()
-        showmol(view, height=500, width=800)
-    except FileNotFoundError:
-        st.error("Could not find files for visualization.")
+    view = py3Dmol.view(width=800, height=500)
+    view.addModelsAsFrames(protein_data)
+    protein_style = {"cartoon": {'color': 'spectrum'}}
+    if pocket_only:
+        protein_style["stick"] = {'radius': 0.15, 'colorscheme': 'whiteCarbon'}
+    view.setStyle({'model': -1}, protein_style)
+
+    # Add ligand with correct format
+    view.addModel(ligand_data, ligand_format)
+    view.setStyle({'model': -1}, {"stick": {'colorscheme': 'greenCarbon'}})
+
+    view.zoomTo()
+    showmol(view, height=500, width=800)
 
 def display_ml_prediction_procedure():
+    # Models load in the background while the user enters molecules
+    start_model_warm_up()
+
     st.header("🔮 Machine Learning Activity Prediction")
     st.info("Predict bioactivity (Active/Inactive) against DPPIV, PPARG, and GLP-1R using Machine Learning Models trained on ECFP4 fingerprints.")
     
@@ -235,6 +183,7 @@ def display_ml_prediction_procedure():
             smiles_list = [s.strip() for s in stringio.split('\n') if s.strip()]
             
     elif input_type == "Draw Molecule":
+        from streamlit_ketcher import st_ketcher
         smile_art = st_ketcher(key="ml_ketcher")
         if smile_art:
             smiles_list = [smile_art]
@@ -248,6 +197,10 @@ def display_ml_prediction_procedure():
             smiles_list = [example_smi]
 
     # 3. Prediction
+    run_in_background = st.checkbox(
+        "Run in background", value=False,
+        help="Queue the prediction on a worker process; results stay available under 'Background jobs'."
+    )
     if st.button("🚀 Run Prediction", type="primary"):
         if not selected_ml_targets:
             st.error("Please select at least one target.")
@@ -256,10 +209,11 @@ def display_ml_prediction_procedure():
         else:
             results = []
             
-            # Load Models
+            # Load Models (a background job only needs the files; its worker loads them)
+            load = ensure_ml_model_file if run_in_background else load_ml_model
             models = {}
             for t in selected_ml_targets:
-                m = load_ml_model(t)
+                m = load(t)
                 if m: models[t] = m
                 else: st.warning(f"Could not load model for {t}")
             
@@ -267,43 +221,40 @@ def display_ml_prediction_procedure():
                 st.error("No models loaded successfully.")
                 return
 
-            progress_bar = st.progress(0)
-            
-            # Process Molecules
-            invalid_log = []
-            for i, smi in enumerate(smiles_list):
-                std_smi = standardize_smiles_rdkit(smi, invalid_log)
-                if std_smi:
-                    fp = calculate_ecfp4(std_smi)
-                    if fp is not None:
-                        # Reshape for sklearn (1, 2048)
-                        fp_reshaped = fp.reshape(1, -1)
-                        
-                        row = {"ID": f"Mol_{i+1}", "SMILES": std_smi}
-                        
-                        for t, model in models.items():
-                            # Predict Activity (0 or 1)
-                            prediction = model.predict(fp_reshaped)[0]
-                            # Predict Probability
-                            proba = model.predict_proba(fp_reshaped)[0][1] # Probability of class 1
-                            
-                            status = "Active 🟢" if prediction == 1 else "Inactive 🔴"
-                            row[f"{t} Activity"] = status
-                            row[f"{t} Prob"] = f"{proba:.2f}"
-                        
-                        results.append(row)
-                progress_bar.progress((i+1)/len(smiles_list))
-                
-            if results:
-                st.success("Prediction Complete!")
-                df_res = pd.DataFrame(results)
-                st.dataframe(df_res)
-                st.download_button("Download Results", convert_df_to_csv(df_res), "prediction_results.csv", "text/csv")
+            if run_in_background:
+                submit_background_job(
+                    "prediction",
+                    {"smiles": smiles_list, "models": {t: str(path) for t, path in models.items()}},
+                    label=f"Prediction: {len(smiles_list)} molecule(s) vs {', '.join(models)}"
+                )
             else:
-                st.warning("No valid molecules processed.")
-            
-            if invalid_log:
-                st.warning(f"Skipped {len(invalid_log)} invalid SMILES.")
+                from utils.ml_prediction import predict_smiles_table
+                progress_bar = st.progress(0)
+
+                # Standardize, then fingerprint and predict all valid molecules at once
+                results, invalid_log = predict_smiles_table(
+                    smiles_list, models, store=get_fingerprint_store(), on_progress=progress_bar.progress,
+                    n_workers=available_cpu_count()
+                )
+                show_prediction_results(results, invalid_log)
+
+    job_result = display_jobs_panel("prediction")
+    if job_result is not None:
+        show_prediction_results(job_result["rows"], job_result["invalid"])
+
+def show_prediction_results(results, invalid_log):
+    import pandas as pd
+
+    if results:
+        st.success("Prediction Complete!")
+        df_res = pd.DataFrame(results)
+        st.dataframe(df_res)
+        st.download_button("Download Results", convert_df_to_csv(df_res), "prediction_results.csv", "text/csv")
+    else:
+        st.warning("No valid molecules processed.")
+
+    if invalid_log:
+        st.warning(f"Skipped {len(invalid_log)} invalid SMILES.")
 
 def display_diabetes_docking_procedure():
     st.header(f"Molecular Docking Model System Targeting Key Proteins Involved In T2DM")
@@ -314,6 +265,7 @@ def display_diabetes_docking_procedure():
         st.session_state.docking_results = []
     if 'prepared_ligand_paths' not in st.session_state:
         st.session_state.prepared_ligand_paths = []
+    workspace = get_session_workspace()
 
     # --- SIDEBAR SETTINGS (Keep this logic) ---
     with st.sidebar:
@@ -331,14 +283,17 @@ def display_diabetes_docking_procedure():
             if not selected_targets_keys:
                 st.warning("Please select at least one target.")
             else:
-                with st.spinner("Downloading receptor and config files..."):
-                    download_count = 0
-                    for key in selected_targets_keys:
-                        info = DIABETES_TARGETS[key]
-                        download_file_from_github(BASE_GITHUB_URL_FOR_DATA, f"targets/{info['pdbqt']}", info['pdbqt'], RECEPTOR_DIR_LOCAL)
-                        download_file_from_github(BASE_GITHUB_URL_FOR_DATA, f"configs/{info['config']}", info['config'], CONFIG_DIR_LOCAL)
-                        download_count += 1
-                    st.success(f"Successfully checked/downloaded data for {download_count} targets.")
+                from utils.assets import FAILED, PRESENT
+                with st.spinner("Fetching receptor and config files..."):
+                    # Only missing or outdated files are fetched, concurrently
+                    results = get_asset_manager().ensure(
+                        asset for key in selected_targets_keys for asset in target_assets(key)
+                    )
+                for r in results:
+                    if r["status"] == FAILED: st.sidebar.error(f"Could not fetch {r['remote']}: {r['error']}")
+                if all(r["status"] != FAILED for r in results):
+                    n_present = sum(r["status"] == PRESENT for r in results)
+                    st.success(f"Data ready for {len(selected_targets_keys)} targets ({len(results) - n_present} file(s) fetched, {n_present} already up to date).")
 
     # --- NEW TABS LAYOUT ---
     tab1, tab2, tab3 = st.tabs(["📂 1. Ligand Input", "🚀 2. Run Docking", "📊 3. Analysis & 3D"])
@@ -348,29 +303,66 @@ def display_diabetes_docking_procedure():
         st.info("Prepare ligands for docking.")
         
         # New Input Methods
-        input_method = st.radio("Input Method:", ("Upload PDBQT/ZIP", "Draw Molecule", "Use Example Molecule"), horizontal=True)
+        input_method = st.radio("Input Method:", ("Upload PDBQT/ZIP", "SMILES Library (.smi/.csv)", "Draw Molecule", "Use Example Molecule"), horizontal=True)
         new_ligands = []
 
         if input_method == "Upload PDBQT/ZIP":
             uploaded_files = st.file_uploader("Select files:", type=["pdbqt", "zip"], accept_multiple_files=True)
             if st.button("Process Files") and uploaded_files:
+                from utils.ligand_ingest import LigandFileIndex, ingest_ligand_upload
+                index = LigandFileIndex(workspace.ligand_index_path, workspace.ligand_dir)
+                progress_bar = st.progress(0)
+                n_existing = 0
                 for up_file in uploaded_files:
-                    if up_file.name.endswith(".zip"):
-                         # (Existing ZIP logic shortened for brevity)
-                        temp_zip = LIGAND_UPLOAD_TEMP_DIR / up_file.name
-                        with open(temp_zip, "wb") as f: f.write(up_file.getbuffer())
-                        with zipfile.ZipFile(temp_zip, 'r') as z: z.extractall(ZIP_EXTRACT_DIR_LOCAL)
-                        for item in ZIP_EXTRACT_DIR_LOCAL.rglob("*.pdbqt"):
-                            dest = LIGAND_PREP_DIR_LOCAL / item.name
-                            shutil.copy(item, dest); new_ligands.append(str(dest))
-                    else:
-                        dest = LIGAND_PREP_DIR_LOCAL / up_file.name
-                        with open(dest, "wb") as f: f.write(up_file.getbuffer())
-                        new_ligands.append(str(dest))
+                    results = ingest_ligand_upload(
+                        up_file, up_file.name, index,
+                        on_progress=lambda done, total: (done == total or done % 100 == 0) and progress_bar.progress(done / total)
+                    )
+                    for result in results:
+                        new_ligands.append(result["path"])
+                        n_existing += result["status"] == "existing"
                 st.success(f"Added {len(new_ligands)} ligands.")
+                if n_existing:
+                    st.caption(f"{n_existing} of them were already prepared with identical content and were not copied again.")
+
+        elif input_method == "SMILES Library (.smi/.csv)":
+            st.write("Prepare a whole SMILES library (protonation, 3D embedding and PDBQT writing) in parallel.")
+            library_file = st.file_uploader("Select library:", type=["smi", "csv"], key="smiles_library")
+            lib_ph = st.number_input("pH:", value=7.4, min_value=0.0, max_value=14.0, step=0.1)
+            if st.button("Prepare Library") and library_file:
+                from utils.library_prep import read_smiles_library, prepare_library
+                # Records are streamed from the upload; its line count only sizes the progress bar
+                n_lines = max(1, library_file.getvalue().count(b"\n"))
+                n_workers = min(available_cpu_count(), n_lines)
+                progress_bar = st.progress(0)
+                status_text = st.empty()
+                failures = []
+                try:
+                    for done, result in enumerate(prepare_library(
+                        read_smiles_library(io.TextIOWrapper(library_file, encoding="utf-8"), library_file.name),
+                        workspace.ligand_dir, n_workers, ph=lib_ph
+                    ), start=1):
+                        if result["pdbqt_path"]: new_ligands.append(result["pdbqt_path"])
+                        else: failures.append({"Name": result["name"], "SMILES": result["smiles"], "Error": result["error"]})
+                        if done % 10 == 0:
+                            status_text.text(f"Prepared {done} molecules ({len(failures)} failed) on {n_workers} worker(s)...")
+                            progress_bar.progress(min(1.0, done / n_lines))
+                except ValueError as e:
+                    st.error(str(e))
+                else:
+                    progress_bar.progress(1.0)
+                    status_text.text(f"Prepared {len(new_ligands) + len(failures)} molecules ({len(failures)} failed) on {n_workers} worker(s).")
+                    st.success(f"Added {len(new_ligands)} ligands.")
+                    if failures:
+                        import pandas as pd
+                        df_failures = pd.DataFrame(failures)
+                        with st.expander(f"⚠️ Failed molecules ({len(failures)})"):
+                            st.dataframe(df_failures, use_container_width=True)
+                            st.download_button("Download failures", convert_df_to_csv(df_failures), "library_failures.csv", "text/csv")
 
         elif input_method == "Draw Molecule":
             st.write("Draw a molecule and convert it to PDBQT for docking.")
+            from streamlit_ketcher import st_ketcher
             drawn_smiles = st_ketcher(key="docking_ketcher")
             lig_name_draw = st.text_input("Ligand Name:", value="drawn_ligand_01")
             
@@ -380,7 +372,7 @@ def display_diabetes_docking_procedure():
                     std_smi = standardize_smiles_rdkit(drawn_smiles, [])
                     if std_smi:
                         result = convert_smiles_to_pdbqt(
-                            std_smi, lig_name_draw, LIGAND_PREP_DIR_LOCAL, 
+                            std_smi, lig_name_draw, workspace.ligand_dir, 
                             7.4, False, False, SCRUB_PY_LOCAL_PATH, MK_PREPARE_LIGAND_PY_LOCAL_PATH
                         )
                         if result:
@@ -398,7 +390,7 @@ def display_diabetes_docking_procedure():
             if st.button("Process Example"):
                 with st.spinner("Processing Metformin..."):
                     result = convert_smiles_to_pdbqt(
-                        example_smi, "metformin_example", LIGAND_PREP_DIR_LOCAL, 
+                        example_smi, "metformin_example", workspace.ligand_dir, 
                         7.4, False, False, SCRUB_PY_LOCAL_PATH, MK_PREPARE_LIGAND_PY_LOCAL_PATH
                     )
                     if result:
@@ -412,6 +404,8 @@ def display_diabetes_docking_procedure():
             current_paths = set(st.session_state.prepared_ligand_paths)
             for p in new_ligands: current_paths.add(p)
             st.session_state.prepared_ligand_paths = list(current_paths)
+        # A workspace left idle long enough may have been evicted along with its ligands
+        st.session_state.prepared_ligand_paths = [p for p in st.session_state.prepared_ligand_paths if Path(p).exists()]
 
         if st.session_state.prepared_ligand_paths:
             with st.expander(f"✅ Ready Ligands ({len(st.session_state.prepared_ligand_paths)})"):
@@ -423,6 +417,26 @@ def display_diabetes_docking_procedure():
     # --- TAB 2: EXECUTION ---
     with tab2:
         st.write("### Simulation Controls")
+        batch_mode = st.checkbox(
+            "Batch mode (one Vina process per target)", value=True,
+            help="Dock all ligands for a target in a single Vina run so the receptor grid is built once. Progress updates per batch."
+        )
+        use_cache = st.checkbox(
+            "Reuse cached results", value=True,
+            help="Skip Vina for ligand/target pairs already docked with identical receptor, config and ligand files."
+        )
+        use_maps = st.checkbox(
+            "Use precomputed affinity maps", value=True,
+            help="Compute each target's grid maps once and load them for every docking. Maps are rebuilt automatically when a receptor or config file changes."
+        )
+        resume_run = st.checkbox(
+            "Resume from checkpoint", value=True,
+            help="If a screen with exactly these ligands, targets and settings was interrupted, skip the pairs it already finished."
+        )
+        run_in_background = st.checkbox(
+            "Run in background", value=False,
+            help="Queue the screen on a worker process so it keeps running across reruns; load its results under 'Background jobs'."
+        )
         if st.button("Start Screening", type="primary"):
             if not vina_ready: st.error("Vina executable is missing.")
             elif not selected_targets_keys: st.error("No targets selected.")
@@ -438,40 +452,116 @@ def display_diabetes_docking_procedure():
                 
                 if len(targets_ready) == len(selected_targets_keys):
                     st.info(f"Docking {len(st.session_state.prepared_ligand_paths)} ligands vs {len(targets_ready)} targets.")
-                    progress_bar = st.progress(0)
-                    status_text = st.empty()
-                    total_tasks = len(st.session_state.prepared_ligand_paths) * len(targets_ready)
-                    completed_tasks = 0
-                    results_data = []
-                    DOCKING_OUTPUT_DIR_LOCAL.mkdir(parents=True, exist_ok=True)
 
+                    # One row per ligand, in input order; cells are filled as jobs finish.
+                    rows_by_ligand = {}
+                    jobs = []
                     for lig_path_str in st.session_state.prepared_ligand_paths:
                         lig_path = Path(lig_path_str)
                         lig_name = lig_path.stem
-                        row_data = {"Ligand": lig_name}
-                        
+                        rows_by_ligand[lig_name] = {"Ligand": lig_name}
                         for t_name, r_path, c_path in targets_ready:
-                            status_text.text(f"Docking {lig_name} against {t_name}...")
-                            out_filename = f"{lig_name}_{DIABETES_TARGETS[t_name]['pdbqt'].replace('.pdbqt', '')}_out.pdbqt"
-                            out_path = DOCKING_OUTPUT_DIR_LOCAL / out_filename
-                            
-                            ret_code, stdout, stderr = run_single_docking(VINA_PATH_LOCAL, r_path, lig_path, c_path, out_path)
-                            
-                            if ret_code == 0 and out_path.exists():
-                                score = parse_vina_score_from_file(out_path)
-                                row_data[t_name] = score if score is not None else "N/A"
-                            else: row_data[t_name] = "Error"
+                            out_filename = docking_output_filename(lig_name, t_name)
+                            jobs.append({
+                                "ligand_name": lig_name, "target_name": t_name,
+                                "receptor_path": r_path, "ligand_path": lig_path, "config_path": c_path,
+                                "output_path": workspace.output_dir / out_filename
+                            })
+
+                    total_tasks = len(jobs)
+                    exhaustiveness = max(config_exhaustiveness(c_path) for _, _, c_path in targets_ready)
+                    # Same inputs -> same run key, so an interrupted screen continues where it stopped
+                    run_key = screening_run_key(jobs, {"maps": use_maps})
+
+                if len(targets_ready) == len(selected_targets_keys) and run_in_background:
+                    submit_background_job("docking", {
+                        "jobs": jobs, "ligands": list(rows_by_ligand), "targets": [t_name for t_name, _, _ in targets_ready],
+                        "run_key": run_key, "vina_path": VINA_PATH_LOCAL, "exhaustiveness": exhaustiveness,
+                        "batch_mode": batch_mode, "use_cache": use_cache, "use_maps": use_maps, "resume": resume_run,
+                        "workspace_dir": str(workspace.path)
+                    }, label=f"Docking: {len(rows_by_ligand)} ligand(s) × {len(targets_ready)} target(s)")
+                elif len(targets_ready) == len(selected_targets_keys):
+                    from utils.screening import run_screening
+                    progress_bar = st.progress(0)
+                    status_text = st.empty()
+                    completed_tasks = 0
+                    cached_tasks = 0
+                    resumed_tasks = 0
+                    duplicate_tasks = 0
+                    results_store = get_results_store()
+                    # A fresh run unless resuming: the journal's pairs are only skipped, not re-recorded
+                    run_id = results_store.start_run(
+                        list(rows_by_ligand), [t_name for t_name, _, _ in targets_ready], run_id=run_key if resume_run else None
+                    )
+
+                    def show_plan(n_workers, cpu_per_job, n_to_dock):
+                        status_text.text(f"Docking {n_to_dock} pair(s) on {n_workers} parallel Vina process(es) with {cpu_per_job} CPU(s) each...")
+
+                    # Pinned so the workspace cannot be evicted under a long screen
+                    with ScreeningJournal(SCREENING_JOURNAL_DIR_LOCAL, run_key) as journal, workspace.pinned():
+                        if not resume_run: journal.reset()
+                        for job, score, source in run_screening(
+                            jobs, VINA_PATH_LOCAL, exhaustiveness, batch_mode=batch_mode,
+                            cache=get_docking_cache() if use_cache else None, on_plan=show_plan,
+                            maps_dir=MAPS_DIR_LOCAL if use_maps else None, journal=journal
+                        ):
+                            rows_by_ligand[job["ligand_name"]][job["target_name"]] = score
+                            if source != "journal":
+                                results_store.record_result(
+                                    run_id, job["ligand_name"], job["target_name"], score, job["output_path"],
+                                    elapsed_s=job.get("elapsed_s") if source == "vina" else 0.0, from_cache=source == "cache"
+                                )
                             completed_tasks += 1
+                            cached_tasks += source == "cache"
+                            resumed_tasks += source == "journal"
+                            duplicate_tasks += source == "duplicate"
+                            status_text.text(f"Docked {job['ligand_name']} against {job['target_name']} ({completed_tasks}/{total_tasks})")
                             progress_bar.progress(completed_tasks / total_tasks)
-                        results_data.append(row_data)
-
+                    if resumed_tasks:
+                        st.caption(f"Resumed from checkpoint: {resumed_tasks} of {total_tasks} pair(s) were already done.")
+                    if cached_tasks:
+                        st.caption(f"{cached_tasks} of {total_tasks} pair(s) served from the result cache.")
+                    if duplicate_tasks:
+                        st.caption(f"{duplicate_tasks} of {total_tasks} pair(s) reused from the same compound loaded under another name.")
+
+                    # Keep target columns in the selected order regardless of completion order
+                    results_data = [
+                        {"Ligand": row["Ligand"], **{t_name: row.get(t_name, "Error") for t_name, _, _ in targets_ready}}
+                        for row in rows_by_ligand.values()
+                    ]
+
+                    results_store.finish_run(run_id)
                     st.session_state.docking_results = results_data
-                    status_text.text("Docking completed!")
+                    st.session_state.docking_run_id = run_id
+                    status_text.text(f"Docking completed! (run {run_id})")
                     st.success("Run Finished.")
                     st.balloons()
 
+        job_result = display_jobs_panel("docking")
+        if job_result is not None:
+            st.session_state.docking_results = job_result["docking_results"]
+            st.session_state.docking_run_id = job_result["run_id"]
+            st.success(f"Loaded results of run {job_result['run_id']} — see Tab 3.")
+
     # --- TAB 3: ANALYSIS ---
     with tab3:
+        past_runs = get_results_store().list_runs()
+        if past_runs or st.session_state.docking_results:
+            import pandas as pd
+        if past_runs:
+            with st.expander("🗂️ Past runs"):
+                run_labels = {
+                    run["run_id"]: f"{run['run_id']} — {pd.Timestamp(run['started_at'], unit='s'):%Y-%m-%d %H:%M} — "
+                                   f"{len(run['ligands'])} ligand(s) × {len(run['targets'])} target(s), {run['n_pairs']} pair(s) done"
+                    for run in past_runs
+                }
+                chosen_run = st.selectbox("Run:", list(run_labels), format_func=run_labels.get)
+                if st.button("Load Run"):
+                    st.session_state.docking_results = get_results_store().run_results_table(chosen_run)
+                    st.session_state.docking_run_id = chosen_run
+                top_n = st.number_input("Top N per target:", min_value=1, max_value=100, value=10)
+                st.dataframe(pd.DataFrame(get_results_store().top_n_per_target(int(top_n), chosen_run)), hide_index=True)
+
         if st.session_state.docking_results:
             df_results = pd.DataFrame(st.session_state.docking_results)
             score_cols = [col for col in df_results.columns if col != 'Ligand']
@@ -497,6 +587,7 @@ def display_diabetes_docking_procedure():
             try:
                 df_melted = df_results.melt(id_vars=['Ligand'], var_name='Target', value_name='Score')
                 df_melted = df_melted.dropna()
+                import plotly.express as px
                 fig = px.box(df_melted, x='Target', y='Score', points="all", color='Target', title="Binding Energy Distribution")
                 st.plotly_chart(fig, use_container_width=True)
             except Exception as e:
@@ -512,26 +603,53 @@ def display_diabetes_docking_procedure():
             with c2:
                 selected_target = st.selectbox("Select Target:", score_cols)
 
+            target_info = DIABETES_TARGETS[selected_target]
+            receptor_file = RECEPTOR_DIR_LOCAL / target_info['pdbqt']
+            out_filename = docking_output_filename(selected_ligand, selected_target)
+            # Runs loaded from the results store may have written their outputs to another workspace
+            stored_output = get_results_store().output_path(st.session_state.get("docking_run_id"), selected_ligand, selected_target)
+            docked_ligand_file = Path(stored_output) if stored_output else workspace.output_dir / out_filename
+            poses = []
+            if docked_ligand_file.exists():
+                from utils.poses import extract_poses
+                # Split once per output file content; later reruns reuse the extracted poses
+                poses = extract_poses(docked_ligand_file, workspace.poses_dir)
+                with st.expander("All binding modes"):
+                    st.dataframe(
+                        pd.DataFrame([{
+                            "Mode": p["mode"], "Affinity (kcal/mol)": p["affinity"],
+                            "RMSD l.b.": p["rmsd_lb"], "RMSD u.b.": p["rmsd_ub"]
+                        } for p in poses]).style.format(precision=3),
+                        hide_index=True
+                    )
+
+            from utils.pocket import DEFAULT_POCKET_RADIUS
+            c3, c4, c5 = st.columns(3)
+            with c3:
+                pose = st.selectbox(
+                    "Pose:", poses, format_func=lambda p: f"Mode {p['mode']} ({p['affinity']:.2f} kcal/mol)",
+                    disabled=not poses
+                )
+            with c4:
+                pocket_radius = st.slider("Binding-site radius (Å):", 4.0, 15.0, DEFAULT_POCKET_RADIUS, 0.5,
+                                          help="Only receptor residues within this distance of the pose are sent to the viewer.")
+            with c5:
+                show_full_receptor = st.checkbox("Show full receptor", value=False,
+                                                 help="Send the whole protein to the viewer (slow for large receptors such as SUR1 or GLP1-R).")
+
+            # Keep the viewer open while switching poses or radius for the same pair
             if st.button("Render 3D Structure"):
-                target_info = DIABETES_TARGETS[selected_target]
-                receptor_file = RECEPTOR_DIR_LOCAL / target_info['pdbqt']
-                out_filename = f"{selected_ligand}_{target_info['pdbqt'].replace('.pdbqt', '')}_out.pdbqt"
-                docked_ligand_file = DOCKING_OUTPUT_DIR_LOCAL / out_filename
-
-                if receptor_file.exists() and docked_ligand_file.exists():
-                    # Output path for PDB
-                    pdb_viz_file = docked_ligand_file.with_suffix(".pdb")
-                    
-                    with st.spinner("Extracting best pose & converting to PDB..."):
-                        # Use the new PDB conversion function
-                        convert_success = convert_pdbqt_to_pdb(docked_ligand_file, pdb_viz_file)
-                    
-                    if convert_success:
-                        st.write(f"Visualizing: **{selected_ligand}** (Best Pose) bound to **{selected_target}**")
-                        # Pass the new PDB file to the viewer
-                        view_complex(str(receptor_file), str(pdb_viz_file))
-                    else:
-                        st.error("Visualization preparation failed.")
+                st.session_state.render_3d_pair = (selected_ligand, selected_target)
+            if st.session_state.get("render_3d_pair") == (selected_ligand, selected_target):
+                if receptor_file.exists() and pose is not None:
+                    from utils.pocket import pocket_complex, receptor_pdb
+                    st.write(f"Visualizing: **{selected_ligand}** (Mode {pose['mode']}) bound to **{selected_target}**")
+                    with st.spinner("Selecting binding-site residues..."):
+                        complex_view = pocket_complex(receptor_file, pose["path"], pocket_radius)
+                        protein_data = receptor_pdb(receptor_file) if show_full_receptor else complex_view["receptor_pdb"]
+                    if not show_full_receptor:
+                        st.caption(f"{complex_view['n_residues']} residue(s) within {pocket_radius:g} Å of the pose.")
+                    view_complex(protein_data, complex_view["ligand_pdb"], pocket_only=not show_full_receptor)
                 else:
                     st.error(f"Output file not found: {out_filename}. Did the docking finish successfully?")
         else:
@@ -554,6 +672,8 @@ def display_about_page():
     - **Automated Vina:** Runs AutoDock Vina automatically for all combinations.
     """)
 
+PAGES = ("T2DM Docking", "T2DM AI prediction", "About")
+
 def main():
     st.set_page_config(layout="wide", page_title=f"Diabetes Docking v{APP_VERSION}")
     
@@ -562,7 +682,7 @@ def main():
     #st.sidebar.image("https://raw.githubusercontent.com/HenryChritopher02/GSJ/main/docking-app.png", width=300)
     st.sidebar.title("Navigation")
 
-    app_mode = st.sidebar.radio("Go to:", ("T2DM Docking", "T2DM AI prediction", "About"))
+    app_mode = st.sidebar.radio("Go to:", PAGES, key="app_mode")
     st.sidebar.markdown("---")
 
     if app_mode == "T2DM Docking":
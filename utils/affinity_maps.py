@@ -0,0 +1,127 @@
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from pathlib import Path
+
+from .docking import read_vina_config
+from .hashing import file_sha256
+
+# XS atom types Vina needs maps for when docking organic, drug-like ligands
+VINA_MAP_ATOM_TYPES = (
+    "C_H", "C_P", "N_P", "N_D", "N_A", "N_DA", "O_A", "O_DA",
+    "S_P", "P_P", "F_H", "Cl_H", "Br_H", "I_H",
+)
+
+# Vina only writes maps for the atom types of the ligand it is given, so maps are
+# computed with a rigid probe holding one fragment per XS type above:
+# (element, AutoDock type, offset from the fragment origin).
+_PROBE_FRAGMENTS = [
+    [("C", "C", 0.0)],
+    [("C", "C", 0.0), ("O", "OA", 1.43)],
+    [("N", "N", 0.0)],
+    [("N", "NA", 0.0)],
+    [("N", "N", 0.0), ("H", "HD", 1.01)],
+    [("N", "NA", 0.0), ("H", "HD", 1.01)],
+    [("O", "OA", 0.0), ("H", "HD", 0.96)],
+    [("S", "SA", 0.0)],
+    [("P", "P", 0.0)],
+    [("F", "F", 0.0)],
+    [("Cl", "Cl", 0.0)],
+    [("Br", "Br", 0.0)],
+    [("I", "I", 0.0)],
+]
+_PROBE_SPACING = 2.5 # Angstrom between fragments, well beyond bonding distance
+
+_maps_lock = threading.Lock()
+
+
+def _probe_ligand_pdbqt(center) -> str:
+    """Rigid PDBQT probe ligand centred on the box, covering every map atom type."""
+    lines = ["ROOT"]
+    serial = 0
+    for k, fragment in enumerate(_PROBE_FRAGMENTS):
+        fx = center[0] + ((k % 4) - 1.5) * _PROBE_SPACING
+        fy = center[1] + ((k // 4) - 1.5) * _PROBE_SPACING
+        for element, ad_type, dx in fragment:
+            serial += 1
+            lines.append("HETATM%5d %-4s UNL     1    %8.3f%8.3f%8.3f  1.00  0.00    +0.000 %-2s" % (
+                serial, element, fx + dx, fy, center[2], ad_type))
+    lines += ["ENDROOT", "TORSDOF 0"]
+    return "\n".join(lines) + "\n"
+
+
+def maps_key(receptor_path, config_path) -> str:
+    """Identifies a map set by the contents of the receptor and config it was computed from."""
+    payload = f"{file_sha256(receptor_path)}:{file_sha256(config_path)}"
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def _maps_complete(prefix: Path) -> bool:
+    return all(prefix.with_name(f"{prefix.name}.{t}.map").exists() for t in VINA_MAP_ATOM_TYPES)
+
+
+def ensure_affinity_maps(vina_path, receptor_path, config_path, maps_root):
+    """
+    Returns the `--maps` prefix for a receptor/config pair, writing the maps first if needed.
+
+    Map sets live in `maps_root/<receptor stem>_<content key>/`; when the receptor or config
+    file changes the key changes, the new set is computed and stale sets for the same
+    receptor are removed. Returns None if Vina could not write a complete set.
+    """
+    receptor_path = Path(receptor_path)
+    maps_root = Path(maps_root)
+    stem = receptor_path.stem
+    key = maps_key(receptor_path, config_path)
+    maps_dir = maps_root / f"{stem}_{key}"
+    prefix = maps_dir / stem
+    if _maps_complete(prefix):
+        return str(prefix)
+
+    with _maps_lock:
+        if _maps_complete(prefix):
+            return str(prefix)
+        maps_root.mkdir(parents=True, exist_ok=True)
+        try:
+            options = read_vina_config(config_path)
+            center = [float(options[f"center_{axis}"]) for axis in "xyz"]
+        except (OSError, KeyError, ValueError):
+            return None
+
+        # Build in a private directory and rename into place, so other processes never
+        # load a half-written set.
+        build_dir = Path(tempfile.mkdtemp(dir=maps_root, prefix=f".{stem}_"))
+        try:
+            probe_path = build_dir / "probe.pdbqt"
+            probe_path.write_text(_probe_ligand_pdbqt(center))
+            cmd = [
+                str(vina_path),
+                "--receptor", str(receptor_path),
+                "--ligand", str(probe_path),
+                "--config", str(config_path),
+                "--write_maps", str(build_dir / stem),
+                "--force_even_voxels",
+                "--score_only"
+            ]
+            # The maps are written before scoring, so a scoring error (e.g. probe atoms
+            # outside a small box) does not matter; only the map files are checked.
+            subprocess.run(cmd, capture_output=True, text=True)
+            probe_path.unlink()
+            if not _maps_complete(build_dir / stem):
+                return None
+            try:
+                os.rename(build_dir, maps_dir)
+            except OSError:
+                if not _maps_complete(prefix):
+                    return None
+        finally:
+            shutil.rmtree(build_dir, ignore_errors=True)
+
+        for stale_dir in maps_root.glob(f"{stem}_*"):
+            stale_key = stale_dir.name[len(stem) + 1:]
+            if stale_dir.is_dir() and stale_dir != maps_dir and len(stale_key) == len(key) \
+                    and all(c in "0123456789abcdef" for c in stale_key):
+                shutil.rmtree(stale_dir, ignore_errors=True)
+    return str(prefix)
@@ -2,71 +2,55 @@ import streamlit as st
 import subprocess
 import os
 import stat
-import requests
 import zipfile
 import shutil
-from urllib.parse import urljoin
 from pathlib import Path
 import sys
-import pandas as pd
-
-# RDKit imports for the standardize function
-from rdkit import Chem
-from rdkit.Chem.MolStandardize import rdMolStandardize
 
 # Import paths from paths.py
 from .paths import (
-    WORKSPACE_PARENT_DIR, LIGAND_PREP_DIR_LOCAL, VINA_PATH_LOCAL, VINA_DIR_LOCAL,
+    WORKSPACE_PARENT_DIR, VINA_PATH_LOCAL, VINA_DIR_LOCAL,
     VINA_EXECUTABLE_NAME
 )
 
+# rdkit, meeko, numpy and requests are imported inside the functions that need them,
+# so importing this module (every page of the app does) stays cheap.
+
 # --- Standardize Function ---
 def standardize_smiles_rdkit(smiles, invalid_smiles_list):
     """Standardizes a SMILES string using RDKit."""
-    try:
-        mol = Chem.MolFromSmiles(smiles)
-        if mol is None:
-            invalid_smiles_list.append(smiles)
-            return None
+    from .standardization import standardize_smiles
 
-        Chem.SanitizeMol(mol)
-        Chem.Kekulize(mol)
-        mol = Chem.RemoveHs(mol)
-
-        uncharger = rdMolStandardize.Uncharger()
-        mol = uncharger.uncharge(mol)
-        mol = rdMolStandardize.Reionizer().reionize(mol)
-
-        metal_disconnector = rdMolStandardize.MetalDisconnector()
-        mol = metal_disconnector.Disconnect(mol)
-
-        mol = rdMolStandardize.FragmentParent(mol)
-        Chem.AssignStereochemistry(mol, force=True, cleanIt=True)
-        standardized_smiles_out = Chem.MolToSmiles(mol, canonical=True, isomericSmiles=False)
-        return standardized_smiles_out
+    try:
+        standardized_smiles_out = standardize_smiles(smiles)
     except Exception as e:
         st.warning(f"Error standardizing SMILES '{smiles}': {e}")
         invalid_smiles_list.append(smiles)
         return None
+    if standardized_smiles_out is None:
+        invalid_smiles_list.append(smiles)
+    return standardized_smiles_out
 
 def initialize_directories():
     # Import all necessary directory paths from paths.py
     from .paths import (
         WORKSPACE_PARENT_DIR, RECEPTOR_DIR_LOCAL, CONFIG_DIR_LOCAL,
-        LIGAND_PREP_DIR_LOCAL, LIGAND_UPLOAD_TEMP_DIR,
-        ZIP_EXTRACT_DIR_LOCAL, DOCKING_OUTPUT_DIR_LOCAL,
-        ENSEMBLE_DOCKING_DIR_LOCAL, LIGAND_PREPROCESSING_SUBDIR_LOCAL, VINA_DIR_LOCAL
+        LIGAND_PREP_DIR_LOCAL, DOCKING_OUTPUT_DIR_LOCAL,
+        ENSEMBLE_DOCKING_DIR_LOCAL, LIGAND_PREPROCESSING_SUBDIR_LOCAL, VINA_DIR_LOCAL,
+        MAPS_DIR_LOCAL
     )
     dirs_to_create = [
         WORKSPACE_PARENT_DIR, RECEPTOR_DIR_LOCAL, CONFIG_DIR_LOCAL,
-        LIGAND_PREP_DIR_LOCAL, LIGAND_UPLOAD_TEMP_DIR,
-        ZIP_EXTRACT_DIR_LOCAL, DOCKING_OUTPUT_DIR_LOCAL,
-        ENSEMBLE_DOCKING_DIR_LOCAL, LIGAND_PREPROCESSING_SUBDIR_LOCAL, VINA_DIR_LOCAL
+        LIGAND_PREP_DIR_LOCAL, DOCKING_OUTPUT_DIR_LOCAL,
+        ENSEMBLE_DOCKING_DIR_LOCAL, LIGAND_PREPROCESSING_SUBDIR_LOCAL, VINA_DIR_LOCAL,
+        MAPS_DIR_LOCAL
     ]
     for dir_path in dirs_to_create:
         dir_path.mkdir(parents=True, exist_ok=True)
 
 def list_files_from_github_repo_dir(owner: str, repo: str, dir_path_in_repo: str, branch: str, gh_api_base_url: str, file_extension: str = None) -> list[str]:
+    import requests
+
     api_url = f"{gh_api_base_url}{owner}/{repo}/contents/{dir_path_in_repo}?ref={branch}"
     filenames = []
     try:
@@ -90,19 +74,6 @@ def list_files_from_github_repo_dir(owner: str, repo: str, dir_path_in_repo: str
         st.sidebar.error(f"Error listing files from GitHub ({dir_path_in_repo}): {e}")
     return filenames
 
-def download_file_from_github(raw_download_base_url, relative_path_segment, local_filename, local_save_dir):
-    full_url = urljoin(raw_download_base_url, relative_path_segment)
-    local_file_path = Path(local_save_dir) / local_filename
-    try:
-        response = requests.get(full_url, stream=True, timeout=15)
-        response.raise_for_status()
-        with open(local_file_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192): f.write(chunk)
-        return str(local_file_path)
-    except requests.exceptions.RequestException as e:
-        st.sidebar.error(f"Error downloading {local_filename} from {full_url}: {e}")
-        return None
-
 def make_file_executable(filepath_str):
     if not filepath_str or not os.path.exists(filepath_str):
         return False
@@ -143,6 +114,8 @@ def check_vina_binary(show_success=True):
             return False
 
 def get_smiles_from_pubchem_inchikey(inchikey_str):
+    import requests
+
     api_url = f"https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/inchikey/{inchikey_str}/property/CanonicalSMILES/JSON"
     try:
         response = requests.get(api_url, timeout=10)
@@ -180,10 +153,35 @@ def run_ligand_prep_script(script_local_path_str, script_args, process_name, lig
     except Exception as e: st.error(f"Unexpected error running {process_name} for {ligand_name_for_log}: {e}"); return False
 
 def convert_smiles_to_pdbqt(smiles_str, ligand_name_base, output_dir_path_for_final_pdbqt, ph_val, skip_taut, skip_acidbase, local_scrub_script_path, local_mk_prepare_script_path):
+    """
+    Prepares a SMILES string as a docking-ready PDBQT in `output_dir_path_for_final_pdbqt`.
+
+    Runs in-process through a shared `LigandPreparer`; the scrub.py / mk_prepare_ligand.py
+    scripts are only used if molscrub or meeko cannot be imported into this interpreter.
+    """
+    from .ligand_prep import get_ligand_preparer, write_pdbqt
+
     output_dir_path_for_final_pdbqt.mkdir(parents=True, exist_ok=True)
-    # Use .name attribute for constructing relative paths within WORKSPACE_PARENT_DIR
-    relative_sdf_filename = Path(LIGAND_PREP_DIR_LOCAL.name) / f"{ligand_name_base}_scrubbed.sdf"
-    relative_pdbqt_filename = Path(LIGAND_PREP_DIR_LOCAL.name) / f"{ligand_name_base}.pdbqt"
+    absolute_pdbqt_path_for_return = Path(output_dir_path_for_final_pdbqt) / f"{ligand_name_base}.pdbqt"
+    try:
+        preparer = get_ligand_preparer(float(ph_val), bool(skip_taut), bool(skip_acidbase))
+    except ImportError:
+        return _convert_smiles_to_pdbqt_with_scripts(
+            smiles_str, ligand_name_base, output_dir_path_for_final_pdbqt, ph_val, skip_taut, skip_acidbase,
+            local_scrub_script_path, local_mk_prepare_script_path
+        )
+    try:
+        write_pdbqt(preparer.smiles_to_pdbqt_string(smiles_str), absolute_pdbqt_path_for_return)
+    except Exception as e:
+        st.error(f"Ligand preparation failed for {ligand_name_base}: {e}")
+        return None
+    return {"id": smiles_str, "pdbqt_path": str(absolute_pdbqt_path_for_return), "base_name": ligand_name_base}
+
+def _convert_smiles_to_pdbqt_with_scripts(smiles_str, ligand_name_base, output_dir_path_for_final_pdbqt, ph_val, skip_taut, skip_acidbase, local_scrub_script_path, local_mk_prepare_script_path):
+    # Paths relative to WORKSPACE_PARENT_DIR, the scripts' working directory
+    output_dir_relative = Path(os.path.relpath(Path(output_dir_path_for_final_pdbqt).resolve(), WORKSPACE_PARENT_DIR.resolve()))
+    relative_sdf_filename = output_dir_relative / f"{ligand_name_base}_scrubbed.sdf"
+    relative_pdbqt_filename = output_dir_relative / f"{ligand_name_base}.pdbqt"
 
     absolute_sdf_path_for_check = WORKSPACE_PARENT_DIR / relative_sdf_filename
     absolute_pdbqt_path_for_return = WORKSPACE_PARENT_DIR / relative_pdbqt_filename
@@ -204,10 +202,25 @@ def convert_smiles_to_pdbqt(smiles_str, ligand_name_base, output_dir_path_for_fi
     return {"id": smiles_str, "pdbqt_path": str(absolute_pdbqt_path_for_return), "base_name": ligand_name_base} if absolute_pdbqt_path_for_return.exists() else None
 
 def convert_ligand_file_to_pdbqt(input_ligand_file_path_absolute, original_filename, output_dir_path_for_final_pdbqt, local_mk_prepare_script_path):
+    from .ligand_prep import get_ligand_preparer, write_pdbqt
+
     output_dir_path_for_final_pdbqt.mkdir(parents=True, exist_ok=True)
     ligand_name_base = Path(original_filename).stem
-    # Use .name attribute for constructing relative paths within WORKSPACE_PARENT_DIR
-    relative_pdbqt_filename = Path(LIGAND_PREP_DIR_LOCAL.name) / f"{ligand_name_base}.pdbqt"
+    absolute_pdbqt_path_for_return = Path(output_dir_path_for_final_pdbqt) / f"{ligand_name_base}.pdbqt"
+    suffix = Path(input_ligand_file_path_absolute).suffix.lower()
+    if suffix in (".sdf", ".mol"):
+        try:
+            preparer = get_ligand_preparer()
+            write_pdbqt(preparer.file_to_pdbqt_string(input_ligand_file_path_absolute), absolute_pdbqt_path_for_return)
+            return {"id": original_filename, "pdbqt_path": str(absolute_pdbqt_path_for_return), "base_name": ligand_name_base}
+        except ImportError:
+            pass
+        except Exception as e:
+            st.error(f"Ligand preparation failed for {ligand_name_base}: {e}")
+            return None
+
+    # Path relative to WORKSPACE_PARENT_DIR, the script's working directory
+    relative_pdbqt_filename = Path(os.path.relpath(Path(output_dir_path_for_final_pdbqt).resolve(), WORKSPACE_PARENT_DIR.resolve())) / f"{ligand_name_base}.pdbqt"
     absolute_pdbqt_path_for_return = WORKSPACE_PARENT_DIR / relative_pdbqt_filename
 
     mk_prepare_args = ["-i", str(Path(input_ligand_file_path_absolute).resolve()), "-o", str(relative_pdbqt_filename)]
@@ -233,37 +246,16 @@ def convert_df_to_csv(df):
     return df.to_csv(index=False).encode('utf-8')
 
 def parse_score_from_pdbqt(pdbqt_file_path: str) -> float | None:
-    try:
-        resolved_path = Path(pdbqt_file_path).resolve()
-        if not resolved_path.exists():
-            st.warning(f"PDBQT file for score parsing not found: {resolved_path}")
-            return None
-        if resolved_path.stat().st_size == 0:
-            st.warning(f"PDBQT file for score parsing is empty: {resolved_path}")
-            return None
-        with open(resolved_path, 'r', encoding='utf-8') as f: lines = f.readlines()
-        for i, line_content in enumerate(lines):
-            current_line_stripped = line_content.strip()
-            if current_line_stripped.upper().startswith("REMARK VINA RESULT:"):
-                parts = current_line_stripped.split(':', 1)
-                if len(parts) > 1:
-                    score_values_str = parts[1].strip()
-                    score_values_list = score_values_str.split()
-                    if score_values_list:
-                        try:
-                            score = float(score_values_list[0])
-                            return score
-                        except ValueError:
-                            st.warning(f"ValueError converting score part '{score_values_list[0]}' to float in {resolved_path.name} on line {i+1}.")
-                            return None
-                    else:
-                        st.warning(f"Score part list is empty after split for VINA RESULT line in {resolved_path.name}.")
-                        return None
-                else:
-                    st.warning(f"'REMARK VINA RESULT:' found, but line splitting by ':' failed in {resolved_path.name}.")
-                    return None
-        st.warning(f"Could not find 'REMARK VINA RESULT:' in {resolved_path.name}.")
+    from .pdbqt_parser import best_affinity
+
+    resolved_path = Path(pdbqt_file_path).resolve()
+    if not resolved_path.exists():
+        st.warning(f"PDBQT file for score parsing not found: {resolved_path}")
         return None
-    except Exception as e:
-        st.error(f"Unexpected error parsing PDBQT file {Path(pdbqt_file_path).name}: {e}")
+    if resolved_path.stat().st_size == 0:
+        st.warning(f"PDBQT file for score parsing is empty: {resolved_path}")
         return None
+    score = best_affinity(resolved_path)
+    if score is None:
+        st.warning(f"Could not find a valid 'REMARK VINA RESULT:' in {resolved_path.name}.")
+    return score
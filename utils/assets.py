@@ -0,0 +1,175 @@
+import json
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urljoin
+
+from .downloads import download_file
+from .hashing import file_sha256
+
+# Outcome of `AssetManager.ensure` per asset
+PRESENT, DOWNLOADED, BUNDLED, FAILED = "present", "downloaded", "bundled", "failed"
+
+
+def make_session(pool_size: int = 4, retries: int = 3):
+    """`requests.Session` with `pool_size` keep-alive connections per host and retries on transient errors."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size,
+        max_retries=Retry(total=retries, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504))
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class AssetManager:
+    """
+    Local cache of the remote data files (receptors, configs, models) with a checksum manifest.
+
+    An asset is a dict with `remote` (path under `base_url`, e.g. "targets/dpp4.pdbqt"),
+    `path` (local file) and optionally `sha256` (pinned content hash). The manifest records
+    each local file's SHA-256, size, mtime and source URL. A file is reused without
+    touching the network while it still matches its manifest entry (and pin) and came from
+    the current `base_url`; it is rehashed only when its size or mtime changed. Files
+    found locally without an entry are adopted as they are.
+
+    Missing or stale assets are copied from `bundle_dir` (a pre-populated tree laid out
+    like the remote, e.g. `bundle_dir/targets/dpp4.pdbqt`) when it has them, otherwise
+    downloaded concurrently over one pooled `requests.Session`. With `offline`, the
+    network is never used.
+    """
+
+    def __init__(self, manifest_path, base_url, bundle_dir=None, offline: bool = False, max_workers: int = 4,
+                 timeout: float = 15, session=None):
+        self.manifest_path = Path(manifest_path)
+        self.base_url = base_url if base_url.endswith("/") else base_url + "/"
+        self.bundle_dir = Path(bundle_dir) if bundle_dir else None
+        self.offline = offline
+        self.max_workers = max(1, max_workers)
+        self.timeout = timeout
+        self._session = session
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        with self._lock:
+            if self._session is None:
+                self._session = make_session(self.max_workers)
+            return self._session
+
+    def _read_manifest(self) -> dict:
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_manifest(self, updates: dict):
+        # Re-read under the lock so concurrent callers in this process do not drop each other's entries
+        with self._lock:
+            manifest = self._read_manifest()
+            manifest.update(updates)
+            self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.manifest_path.with_name(f".{self.manifest_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.manifest_path)
+
+    @staticmethod
+    def _entry(path, source, digest=None) -> dict:
+        st_info = os.stat(path)
+        return {
+            "sha256": digest or file_sha256(path), "size": st_info.st_size, "mtime_ns": st_info.st_mtime_ns,
+            "source": source,
+        }
+
+    def _check(self, asset, entry):
+        """Manifest entry for a valid local copy of `asset`, or None if it has to be fetched."""
+        path = Path(asset["path"])
+        try:
+            st_info = path.stat()
+        except OSError:
+            return None
+        if entry is None:
+            # Present before the manifest knew about it (e.g. shipped with the app)
+            entry = self._entry(path, None)
+        elif (entry["size"], entry["mtime_ns"]) != (st_info.st_size, st_info.st_mtime_ns):
+            digest = file_sha256(path)
+            if digest != entry["sha256"]:
+                return None
+            entry = self._entry(path, entry["source"], digest)
+        if entry["source"] is not None and entry["source"] != urljoin(self.base_url, asset["remote"]) \
+                and not entry["source"].startswith("bundle:"):
+            return None
+        if asset.get("sha256") and entry["sha256"] != asset["sha256"]:
+            return None
+        return entry
+
+    def _fetch(self, asset):
+        """Copies `asset` from the bundle or downloads it. Returns `(status, manifest entry)`."""
+        path = Path(asset["path"])
+        bundled = self.bundle_dir / asset["remote"] if self.bundle_dir else None
+        if bundled is not None and bundled.is_file():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            try:
+                shutil.copyfile(bundled, tmp_path)
+                os.replace(tmp_path, path)
+            finally:
+                tmp_path.unlink(missing_ok=True)
+            status, source = BUNDLED, f"bundle:{asset['remote']}"
+        elif self.offline:
+            raise OSError(f"{asset['remote']} is not available offline (not in the asset bundle)")
+        else:
+            download_file(self.base_url, asset["remote"], path.name, path.parent, timeout=self.timeout, session=self.session)
+            status, source = DOWNLOADED, urljoin(self.base_url, asset["remote"])
+        entry = self._entry(path, source)
+        if asset.get("sha256") and entry["sha256"] != asset["sha256"]:
+            path.unlink(missing_ok=True)
+            raise OSError(f"{asset['remote']}: checksum mismatch (expected {asset['sha256']}, got {entry['sha256']})")
+        return status, entry
+
+    def ensure(self, assets, refresh: bool = False) -> list[dict]:
+        """
+        Makes every asset available locally, fetching only missing, modified or outdated
+        ones (all of them with `refresh`). Returns one dict per asset: the asset plus
+        `status` (PRESENT, DOWNLOADED, BUNDLED or FAILED) and `error`.
+        """
+        assets = list(assets)
+        manifest = self._read_manifest()
+        results = [None] * len(assets)
+        updates = {}
+        to_fetch = []
+        for i, asset in enumerate(assets):
+            key = str(Path(asset["path"]))
+            entry = None if refresh else self._check(asset, manifest.get(key))
+            if entry is None:
+                to_fetch.append(i)
+                continue
+            if entry != manifest.get(key):
+                updates[key] = entry
+            results[i] = {**asset, "status": PRESENT, "error": None}
+
+        def fetch(i):
+            try:
+                status, entry = self._fetch(assets[i])
+            except Exception as e:
+                return i, FAILED, None, str(e) or type(e).__name__
+            return i, status, entry, None
+
+        if to_fetch:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(to_fetch))) as pool:
+                for i, status, entry, error in pool.map(fetch, to_fetch):
+                    results[i] = {**assets[i], "status": status, "error": error}
+                    if entry is not None:
+                        updates[str(Path(assets[i]["path"]))] = entry
+        if updates:
+            self._write_manifest(updates)
+        return results
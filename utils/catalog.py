@@ -0,0 +1,129 @@
+import functools
+from pathlib import Path
+
+from .paths import (
+    RECEPTOR_DIR_LOCAL, CONFIG_DIR_LOCAL, MODELS_DIR_LOCAL,
+    ASSET_MANIFEST_PATH, ASSET_BASE_URL, ASSET_BUNDLE_DIR, ASSET_OFFLINE, ASSET_DOWNLOAD_WORKERS
+)
+
+# --- CẤU HÌNH CÁC MỤC TIÊU TIỂU ĐƯỜNG ---
+# Giả định các file này nằm trong thư mục 'targets' và 'configs' trên GitHub
+# Bạn cần đảm bảo tên file trên GitHub khớp với định nghĩa ở đây.
+DIABETES_TARGETS = {
+    "DPP-4 (4A5S)": {
+        "pdbqt": "dpp4.pdbqt",
+        "config": "dpp4.txt"
+    },
+    "GLP1-R (6X19)": {
+        "pdbqt": "glp1r.pdbqt",
+        "config": "glp1r.txt"
+    },
+    "PPAR-γ (5Y2O)": {
+        "pdbqt": "pparg.pdbqt",
+        "config": "pparg.txt"
+    },
+    "SGLT2 (8HEZ)": {
+        "pdbqt": "sglt2.pdbqt",
+        "config": "sglt2.txt"
+    },
+    "SUR1 (7S5V)": {
+        "pdbqt": "sur1.pdbqt",
+        "config": "sur1.txt"
+    }
+}
+
+# Define ML Models (Ensure these exist in your GitHub 'models/' folder)
+ML_MODELS_CONFIG = {
+    "DPP-4": "dppiv.pkl",
+    "PPAR-γ": "pparg.pkl",
+    "GLP1-R": "glp1r.pkl"
+}
+
+
+def _lookup(catalog: dict, name: str, aliases) -> str:
+    """Finds a catalog key by exact name, case-insensitive name or file stem alias."""
+    if name in catalog:
+        return name
+    wanted = name.strip().lower()
+    for key in catalog:
+        if wanted in (key.lower(), *aliases(key)):
+            return key
+    raise KeyError(f"Unknown name '{name}'. Choose from: {', '.join(catalog)}")
+
+
+def find_target(name: str) -> str:
+    """Catalog key of a docking target, given its key (e.g. "DPP-4 (4A5S)") or file stem (e.g. "dpp4")."""
+    return _lookup(DIABETES_TARGETS, name, lambda key: (
+        Path(DIABETES_TARGETS[key]["pdbqt"]).stem.lower(), key.split(" (")[0].lower()
+    ))
+
+
+def find_model(name: str) -> str:
+    """Catalog key of an activity model, given its key (e.g. "DPP-4") or file stem (e.g. "dppiv")."""
+    return _lookup(ML_MODELS_CONFIG, name, lambda key: (Path(ML_MODELS_CONFIG[key]).stem.lower(),))
+
+
+def target_files(target_name: str, receptor_dir=RECEPTOR_DIR_LOCAL, config_dir=CONFIG_DIR_LOCAL) -> tuple[Path, Path]:
+    """Local `(receptor .pdbqt, Vina config)` paths of a catalog target."""
+    info = DIABETES_TARGETS[target_name]
+    return Path(receptor_dir) / info["pdbqt"], Path(config_dir) / info["config"]
+
+
+@functools.lru_cache(maxsize=1)
+def get_asset_manager():
+    """Shared `AssetManager` configured from `paths.py` (base URL, bundle, offline mode)."""
+    from .assets import AssetManager
+    return AssetManager(ASSET_MANIFEST_PATH, ASSET_BASE_URL, bundle_dir=ASSET_BUNDLE_DIR, offline=ASSET_OFFLINE,
+                        max_workers=ASSET_DOWNLOAD_WORKERS)
+
+
+def target_assets(target_name: str, receptor_dir=RECEPTOR_DIR_LOCAL, config_dir=CONFIG_DIR_LOCAL) -> list[dict]:
+    """Receptor and config of a catalog target as `AssetManager` assets."""
+    info = DIABETES_TARGETS[target_name]
+    receptor_path, config_path = target_files(target_name, receptor_dir, config_dir)
+    return [
+        {"remote": f"targets/{info['pdbqt']}", "path": receptor_path},
+        {"remote": f"configs/{info['config']}", "path": config_path},
+    ]
+
+
+def _ensure(assets, refresh=False) -> list[dict]:
+    results = get_asset_manager().ensure(assets, refresh=refresh)
+    failed = [r for r in results if r["error"]]
+    if failed:
+        raise OSError("; ".join(f"Could not fetch {r['remote']}: {r['error']}" for r in failed))
+    return results
+
+
+def fetch_targets(target_names, receptor_dir=RECEPTOR_DIR_LOCAL, config_dir=CONFIG_DIR_LOCAL,
+                  refresh: bool = False) -> dict[str, tuple[Path, Path]]:
+    """
+    Makes the receptors and configs of `target_names` available locally (fetching missing
+    or outdated ones concurrently) and returns `{target: (receptor path, config path)}`.
+    Raises OSError if any could not be fetched.
+    """
+    _ensure([asset for t in target_names for asset in target_assets(t, receptor_dir, config_dir)], refresh)
+    return {t: target_files(t, receptor_dir, config_dir) for t in target_names}
+
+
+def fetch_target_files(target_name: str, receptor_dir=RECEPTOR_DIR_LOCAL, config_dir=CONFIG_DIR_LOCAL,
+                       refresh: bool = False) -> tuple[Path, Path]:
+    """Makes a target's receptor and config available locally and returns their paths."""
+    return fetch_targets([target_name], receptor_dir, config_dir, refresh)[target_name]
+
+
+def docking_output_filename(ligand_name: str, target_name: str) -> str:
+    """Name of the Vina output file for a (ligand, target) pair."""
+    return f"{ligand_name}_{Path(DIABETES_TARGETS[target_name]['pdbqt']).stem}_out.pdbqt"
+
+
+def model_path(model_name: str, models_dir=MODELS_DIR_LOCAL) -> Path:
+    """Local path of a catalog activity model."""
+    return Path(models_dir) / ML_MODELS_CONFIG[model_name]
+
+
+def fetch_model_file(model_name: str, models_dir=MODELS_DIR_LOCAL) -> Path:
+    """Makes a catalog activity model available locally (fetching it if missing or outdated) and returns its path."""
+    local_path = model_path(model_name, models_dir)
+    _ensure([{"remote": f"models/{local_path.name}", "path": local_path}])
+    return local_path
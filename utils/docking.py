@@ -0,0 +1,282 @@
+import functools
+import os
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+# Vina runs `exhaustiveness` Monte Carlo searches in parallel, so giving a single
+# process more CPUs than that only leaves the extra cores idle.
+DEFAULT_EXHAUSTIVENESS = 8
+
+
+def read_vina_config(config_path) -> dict:
+    """Reads a Vina config file (`key = value` lines) into a dict of strings."""
+    options = {}
+    with open(config_path, 'r') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if '=' not in line:
+                continue
+            key, value = line.split('=', 1)
+            options[key.strip()] = value.strip()
+    return options
+
+
+def config_exhaustiveness(config_path) -> int:
+    """Returns the exhaustiveness set in a Vina config file, or Vina's default."""
+    try:
+        return max(1, int(read_vina_config(config_path).get('exhaustiveness', DEFAULT_EXHAUSTIVENESS)))
+    except (OSError, ValueError):
+        return DEFAULT_EXHAUSTIVENESS
+
+
+def available_cpu_count() -> int:
+    """Number of CPUs this process may run on (respects affinity/cgroup pinning where available)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def plan_cpu_allocation(n_tasks: int, exhaustiveness: int = DEFAULT_EXHAUSTIVENESS, total_cpus: int | None = None) -> tuple[int, int]:
+    """
+    Chooses the number of concurrent Vina processes and the `--cpu` value for each one.
+
+    Small grids get few processes with several threads each (capped at the exhaustiveness,
+    beyond which Vina cannot use more threads); large grids get one single-threaded process
+    per core. The product never exceeds `total_cpus`.
+    """
+    total_cpus = max(1, total_cpus or available_cpu_count())
+    n_tasks = max(1, n_tasks)
+    cpu_per_job = max(1, min(exhaustiveness, total_cpus // n_tasks))
+    n_workers = max(1, min(n_tasks, total_cpus // cpu_per_job))
+    return n_workers, cpu_per_job
+
+
+@functools.lru_cache(maxsize=None)
+def vina_version(vina_path) -> str:
+    """Version string reported by the Vina binary (falls back to the file name)."""
+    try:
+        proc = subprocess.run([str(vina_path), "--version"], capture_output=True, text=True, timeout=30)
+        version = proc.stdout.strip()
+        if proc.returncode == 0 and version:
+            return version
+    except (OSError, subprocess.SubprocessError):
+        pass
+    return Path(vina_path).name
+
+
+def _receptor_args(receptor_path, maps_prefix=None):
+    """Vina arguments selecting the receptor: precomputed affinity maps when available."""
+    if maps_prefix:
+        return ["--maps", str(maps_prefix)]
+    return ["--receptor", str(receptor_path)]
+
+
+class VinaProcessGroup:
+    """
+    Vina processes started on behalf of one caller, so they can all be stopped at once.
+
+    After `stop`, running processes are terminated and starting new ones raises
+    RuntimeError.
+    """
+
+    def __init__(self):
+        self._procs = set()
+        self._lock = threading.Lock()
+        self._stopped = False
+
+    def run(self, cmd) -> subprocess.CompletedProcess:
+        """Like `subprocess.run(cmd, capture_output=True, text=True)`, but stoppable."""
+        with self._lock:
+            if self._stopped:
+                raise RuntimeError("Docking was stopped.")
+            # Own process group, so `stop` also reaches anything Vina (or a wrapper script) spawned
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, start_new_session=True)
+            self._procs.add(proc)
+        try:
+            stdout, stderr = proc.communicate()
+        finally:
+            with self._lock:
+                self._procs.discard(proc)
+        return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+
+    def stop(self):
+        with self._lock:
+            self._stopped = True
+            procs = list(self._procs)
+        for proc in procs:
+            try:
+                os.killpg(proc.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+
+def _run_vina(cmd, processes: VinaProcessGroup | None):
+    if processes is not None:
+        return processes.run(cmd)
+    return subprocess.run(cmd, capture_output=True, text=True)
+
+
+def run_single_docking(vina_path, receptor_path, ligand_path, config_path, output_path, cpu=2, maps_prefix=None,
+                       processes: VinaProcessGroup | None = None):
+    """
+    Hàm chạy Vina cho 1 cặp Receptor - Ligand.
+
+    With `maps_prefix`, Vina loads precomputed affinity maps instead of building them from
+    the receptor; if that fails (e.g. a ligand atom type without a map) the job is rerun
+    against the receptor itself. With `processes`, Vina is started through that group so
+    the caller can stop it.
+    """
+    # Vina writes to a temporary file that replaces `output_path` only on success, so a
+    # crashed run never leaves a truncated pose file and cached hard links are never
+    # rewritten in place. A previous output is removed first so it cannot pass for this run's.
+    output_path = Path(output_path)
+    output_path.unlink(missing_ok=True)
+    fd, tmp_out = tempfile.mkstemp(dir=output_path.parent, prefix=f".{output_path.stem}.", suffix=".pdbqt")
+    os.close(fd)
+    cmd = [
+        str(vina_path),
+        *_receptor_args(receptor_path, maps_prefix),
+        "--ligand", str(ligand_path),
+        "--config", str(config_path),
+        "--out", tmp_out,
+        "--cpu", str(cpu)
+    ]
+
+    # Chạy lệnh
+    try:
+        proc = _run_vina(cmd, processes)
+        returncode, stderr = proc.returncode, proc.stderr
+        if returncode == 0:
+            if os.path.getsize(tmp_out) > 0:
+                os.replace(tmp_out, output_path)
+            else:
+                returncode, stderr = 1, f"{stderr}Vina exited without writing any pose.\n"
+    finally:
+        if os.path.exists(tmp_out):
+            os.remove(tmp_out)
+    if returncode != 0 and maps_prefix:
+        return run_single_docking(vina_path, receptor_path, ligand_path, config_path, output_path, cpu, processes=processes)
+    return returncode, proc.stdout, stderr
+
+
+def run_batch_docking(vina_path, batch_jobs, cpu=2, processes: VinaProcessGroup | None = None):
+    """
+    Docks several ligands against one receptor/config in a single Vina process.
+
+    Uses Vina's `--batch`/`--dir` mode so the receptor grid is built once for the whole
+    batch. Vina names its outputs `<ligand stem>_out.pdbqt`; they are moved to each job's
+    own `output_path`. Ligands Vina did not produce an output for (e.g. after it aborted
+    on a bad input) are retried one by one. Returns a list of
+    `(job, returncode, stdout, stderr)`, one per job.
+    """
+    first_job = batch_jobs[0]
+    output_dir = Path(first_job["output_path"]).parent
+    output_dir.mkdir(parents=True, exist_ok=True)
+    results = []
+    # Private --dir so batches for different targets never see each other's files
+    with tempfile.TemporaryDirectory(dir=output_dir, prefix=".vina_batch_") as batch_dir:
+        cmd = [
+            str(vina_path),
+            *_receptor_args(first_job["receptor_path"], first_job.get("maps_prefix")),
+            "--config", str(first_job["config_path"]),
+            "--dir", batch_dir,
+            "--cpu", str(cpu)
+        ]
+        for job in batch_jobs:
+            cmd += ["--batch", str(job["ligand_path"])]
+            Path(job["output_path"]).unlink(missing_ok=True)
+        proc = _run_vina(cmd, processes)
+
+        for job in batch_jobs:
+            vina_out = Path(batch_dir) / f"{Path(job['ligand_path']).stem}_out.pdbqt"
+            if vina_out.exists() and vina_out.stat().st_size > 0:
+                shutil.move(str(vina_out), str(job["output_path"]))
+                results.append((job, 0, proc.stdout, proc.stderr))
+            else:
+                results.append((job, *run_single_docking(
+                    vina_path, job["receptor_path"], job["ligand_path"],
+                    job["config_path"], job["output_path"], cpu, job.get("maps_prefix"), processes
+                )))
+    return results
+
+
+def plan_batches(jobs, exhaustiveness: int = DEFAULT_EXHAUSTIVENESS, total_cpus: int | None = None):
+    """
+    Groups jobs by (receptor, config) into Vina batches.
+
+    Each target gets one batch, split further only when there are enough CPUs to give
+    every extra batch a full `exhaustiveness` worth of threads. Returns
+    `(batches, n_workers, cpu_per_job)`.
+    """
+    total_cpus = max(1, total_cpus or available_cpu_count())
+    groups = {}
+    for job in jobs:
+        groups.setdefault((str(job["receptor_path"]), str(job["config_path"])), []).append(job)
+    if not groups:
+        return [], 1, 1
+
+    chunks_per_group = max(1, total_cpus // (len(groups) * max(1, exhaustiveness)))
+    batches = []
+    for group_jobs in groups.values():
+        n_chunks = min(chunks_per_group, len(group_jobs))
+        for i in range(n_chunks):
+            batches.append(group_jobs[i::n_chunks])
+    n_workers, cpu_per_job = plan_cpu_allocation(len(batches), exhaustiveness, total_cpus)
+    return batches, n_workers, cpu_per_job
+
+
+def dock_grid(jobs, vina_path, n_workers, cpu_per_job, batches=None):
+    """
+    Runs docking jobs on a pool of `n_workers` concurrent Vina processes.
+
+    Each job is a dict with `receptor_path`, `ligand_path`, `config_path`, `output_path` and
+    optionally `maps_prefix` (extra keys are passed through untouched). When `batches` (from
+    `plan_batches`) is given, each batch runs as one multi-ligand Vina process instead of
+    one process per job. Yields `(job, returncode, stdout, stderr)` in completion order, so
+    the caller can update progress from its own thread. Each job's wall time is stored in
+    `job["elapsed_s"]` (a batch's time is split evenly across its jobs). If the caller
+    stops early, the Vina processes still running are terminated.
+    """
+    def timed(fn, *args):
+        start = time.perf_counter()
+        outcome = fn(*args)
+        return time.perf_counter() - start, outcome
+
+    # Threads are enough here: each worker only waits on its Vina subprocess.
+    pool = ThreadPoolExecutor(max_workers=max(1, n_workers))
+    processes = VinaProcessGroup()
+    try:
+        if batches is not None:
+            futures = {pool.submit(timed, run_batch_docking, vina_path, batch, cpu_per_job, processes): batch for batch in batches}
+        else:
+            futures = {
+                pool.submit(
+                    timed, run_single_docking, vina_path, job["receptor_path"], job["ligand_path"],
+                    job["config_path"], job["output_path"], cpu_per_job, job.get("maps_prefix"), processes
+                ): [job]
+                for job in jobs
+            }
+        for future in as_completed(futures):
+            future_jobs = futures[future]
+            try:
+                elapsed, outcome = future.result()
+                job_results = outcome if batches is not None else [(future_jobs[0], *outcome)]
+            except Exception as e:
+                elapsed = None
+                job_results = [(job, -1, "", str(e)) for job in future_jobs]
+            for job, ret_code, stdout, stderr in job_results:
+                job["elapsed_s"] = elapsed / len(future_jobs) if elapsed is not None else None
+                yield job, ret_code, stdout, stderr
+    finally:
+        # If the caller stops early (e.g. a Streamlit rerun), kill the running Vina
+        # processes and drop the jobs that have not started instead of running the rest
+        # of the grid. After a normal finish there is nothing left to stop.
+        processes.stop()
+        pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+
+from .hashing import file_sha256
+
+
+def link_or_copy(src, dst):
+    """Hard-links `src` to `dst` (replacing `dst`), falling back to a copy across filesystems."""
+    dst = Path(dst)
+    if dst.exists() and os.path.samefile(src, dst):
+        return
+    tmp_dst = dst.with_name(f".{dst.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        os.link(src, tmp_dst)
+    except OSError:
+        shutil.copyfile(src, tmp_dst)
+    os.replace(tmp_dst, dst)
+
+
+class DockingResultCache:
+    """
+    Content-addressed, size-bounded store of Vina output poses and best scores.
+
+    Entries are keyed on the receptor, config and ligand file hashes plus the Vina
+    version and any extra search parameters, so a hit is valid no matter which session,
+    file name or upload produced the ligand. Each entry is `<key>.pdbqt` with a
+    `<key>.json` sidecar holding the score; file mtimes record last use and the least
+    recently used entries are evicted once the cache exceeds `max_bytes`.
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None
+
+    @staticmethod
+    def make_key(receptor_path, config_path, ligand_path, vina_version, search_params=None) -> str:
+        payload = json.dumps({
+            "receptor": file_sha256(receptor_path),
+            "config": file_sha256(config_path),
+            "ligand": file_sha256(ligand_path),
+            "vina": vina_version,
+            "params": search_params or {},
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _entry_paths(self, key):
+        return self.cache_dir / f"{key}.pdbqt", self.cache_dir / f"{key}.json"
+
+    def get(self, key, output_path):
+        """
+        Returns the cached best score and places the cached pose file at `output_path`,
+        or returns None on a miss.
+        """
+        pose_path, meta_path = self._entry_paths(key)
+        try:
+            with open(meta_path, 'r') as f:
+                score = json.load(f).get("score")
+            link_or_copy(pose_path, output_path)
+            os.utime(pose_path)
+            os.utime(meta_path)
+        except (OSError, ValueError):
+            return None
+        return score
+
+    def put(self, key, output_path, score):
+        """Stores a finished docking output under `key` and evicts old entries if over budget."""
+        pose_path, meta_path = self._entry_paths(key)
+        try:
+            link_or_copy(output_path, pose_path)
+            tmp_meta = meta_path.with_name(f".{meta_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp_meta, 'w') as f:
+                json.dump({"score": score}, f)
+            os.replace(tmp_meta, meta_path)
+        except OSError:
+            return
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes += pose_path.stat().st_size + meta_path.stat().st_size
+        self.evict()
+
+    def _scan(self):
+        entries = {}
+        for path in self.cache_dir.iterdir():
+            if path.name.startswith('.') or path.suffix not in (".pdbqt", ".json"):
+                continue
+            try:
+                st_info = path.stat()
+            except OSError:
+                continue
+            size, last_used = entries.get(path.stem, (0, 0))
+            entries[path.stem] = (size + st_info.st_size, max(last_used, st_info.st_mtime))
+        return entries
+
+    def evict(self):
+        """Drops least recently used entries until the cache fits in `max_bytes`."""
+        with self._lock:
+            if self._total_bytes is not None and self._total_bytes <= self.max_bytes:
+                return
+            entries = self._scan()
+            total = sum(size for size, _ in entries.values())
+            for key, (size, _) in sorted(entries.items(), key=lambda item: item[1][1]):
+                if total <= self.max_bytes:
+                    break
+                for path in self._entry_paths(key):
+                    try:
+                        path.unlink()
+                    except FileNotFoundError:
+                        pass
+                total -= size
+            self._total_bytes = total
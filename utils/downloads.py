@@ -0,0 +1,30 @@
+import os
+import threading
+from pathlib import Path
+from urllib.parse import urljoin
+
+
+def download_file(raw_download_base_url, relative_path_segment, local_filename, local_save_dir, timeout=15,
+                  session=None) -> Path:
+    """
+    Downloads `relative_path_segment` under `raw_download_base_url` to `local_save_dir/local_filename`.
+
+    The file is written to a temporary name and renamed on success, so an interrupted
+    download never leaves a truncated file behind. Pass a `requests.Session` to reuse its
+    pooled connections. Raises `requests.RequestException` on HTTP or network errors.
+    """
+    import requests
+
+    full_url = urljoin(raw_download_base_url, relative_path_segment)
+    local_file_path = Path(local_save_dir) / local_filename
+    local_file_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = local_file_path.with_name(f".{local_file_path.name}.{os.getpid()}.{threading.get_ident()}.part")
+    try:
+        with (session or requests).get(full_url, stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            with open(tmp_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=1 << 16): f.write(chunk)
+        tmp_path.replace(local_file_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return local_file_path
@@ -0,0 +1,58 @@
+import sqlite3
+import threading
+from pathlib import Path
+
+import numpy as np
+
+# Stay under SQLite's default limit on bound parameters per statement
+_SQL_BATCH = 900
+
+
+class FingerprintStore:
+    """
+    On-disk cache of bit fingerprints keyed by canonical SMILES.
+
+    Fingerprints are stored bit-packed (256 bytes for 2048 bits) in a SQLite table named
+    after the fingerprint settings, so changing the radius or length never mixes up
+    entries. Safe to share between threads and processes.
+    """
+
+    def __init__(self, db_path, radius=2, n_bits=2048):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.n_bits = n_bits
+        self.table = f"morgan_r{int(radius)}_{int(n_bits)}"
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {self.table} (smiles TEXT PRIMARY KEY, bits BLOB NOT NULL)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, smiles_list):
+        """Returns `{smiles: uint8 bit vector}` for the SMILES already in the store."""
+        found = {}
+        unique_smiles = list(dict.fromkeys(smiles_list))
+        conn = self._connect()
+        for start in range(0, len(unique_smiles), _SQL_BATCH):
+            batch = unique_smiles[start:start + _SQL_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            for smiles, blob in conn.execute(
+                f"SELECT smiles, bits FROM {self.table} WHERE smiles IN ({placeholders})", batch
+            ):
+                found[smiles] = np.unpackbits(np.frombuffer(blob, dtype=np.uint8), count=self.n_bits)
+        return found
+
+    def put_many(self, items):
+        """Stores `(smiles, uint8 bit vector)` pairs, keeping existing entries."""
+        rows = [(smiles, np.packbits(np.asarray(bits, dtype=np.uint8)).tobytes()) for smiles, bits in items]
+        if not rows:
+            return
+        with self._connect() as conn:
+            conn.executemany(f"INSERT OR IGNORE INTO {self.table} (smiles, bits) VALUES (?, ?)", rows)
@@ -0,0 +1,31 @@
+import hashlib
+import os
+import threading
+
+_digest_cache = {}
+_digest_lock = threading.Lock()
+
+
+def file_sha256(path) -> str:
+    """
+    SHA-256 hex digest of a file's contents.
+
+    Digests are memoized per (path, size, mtime), so hashing the same receptor or
+    config for every job of a screen only reads the file once.
+    """
+    path = os.path.abspath(str(path))
+    st_info = os.stat(path)
+    memo_key = (path, st_info.st_size, st_info.st_mtime_ns)
+    with _digest_lock:
+        digest = _digest_cache.get(memo_key)
+    if digest is not None:
+        return digest
+
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    digest = h.hexdigest()
+    with _digest_lock:
+        _digest_cache[memo_key] = digest
+    return digest
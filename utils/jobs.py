@@ -0,0 +1,283 @@
+import json
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from .docking import available_cpu_count
+from .workspace import Workspace, pid_alive
+
+# Job states; "interrupted" marks jobs that were queued or running when the server stopped.
+QUEUED, RUNNING, DONE, FAILED, CANCELLED, INTERRUPTED = (
+    "queued", "running", "done", "failed", "cancelled", "interrupted"
+)
+FINISHED_STATES = (DONE, FAILED, CANCELLED, INTERRUPTED)
+
+# Minimum seconds between progress writes from a worker, so large screens do not
+# rewrite status.json for every pair.
+_PROGRESS_INTERVAL_S = 0.5
+
+_PATH_KEYS = ("receptor_path", "ligand_path", "config_path", "output_path")
+
+# Identifies this process beyond its pid, which a restarted server may be given again.
+_PROCESS_TOKEN = uuid.uuid4().hex
+
+
+def _write_json(path, data):
+    """Writes JSON atomically, so pollers never read a half-written file."""
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class _StatusWriter:
+    """Updates a job's status.json from inside the worker process."""
+
+    def __init__(self, job_dir: Path):
+        self.path = job_dir / "status.json"
+        self.status = _read_json(self.path) or {}
+        self._last_write = 0.0
+
+    def update(self, force=False, **fields):
+        self.status.update(fields)
+        now = time.monotonic()
+        if force or now - self._last_write >= _PROGRESS_INTERVAL_S:
+            self.status["updated_at"] = time.time()
+            _write_json(self.path, self.status)
+            self._last_write = now
+
+    def progress(self, fraction, message=None):
+        fields = {"progress": round(float(fraction), 4)}
+        if message is not None:
+            fields["message"] = message
+        self.update(**fields)
+
+
+def _run_docking_job(spec, status: _StatusWriter):
+    from .docking_cache import DockingResultCache
+    from .paths import (
+        DOCKING_CACHE_DIR_LOCAL, DOCKING_CACHE_MAX_BYTES, MAPS_DIR_LOCAL,
+        RESULTS_DB_PATH, SCREENING_JOURNAL_DIR_LOCAL
+    )
+    from .results_store import ResultsStore
+    from .screening import run_screening
+    from .screening_journal import ScreeningJournal
+
+    jobs = [{k: Path(v) if k in _PATH_KEYS else v for k, v in job.items()} for job in spec["jobs"]]
+    ligands, targets = spec["ligands"], spec["targets"]
+    total_tasks = len(jobs)
+    rows_by_ligand = {lig: {"Ligand": lig} for lig in ligands}
+
+    resume = spec.get("resume", True)
+    results_store = ResultsStore(RESULTS_DB_PATH)
+    run_id = results_store.start_run(ligands, targets, run_id=spec["run_key"] if resume else None)
+
+    def show_plan(n_workers, cpu_per_job, n_to_dock):
+        status.update(force=True, message=f"Docking {n_to_dock} pair(s) on {n_workers} parallel Vina process(es) with {cpu_per_job} CPU(s) each...")
+
+    completed = cached = resumed = duplicates = 0
+    with ScreeningJournal(SCREENING_JOURNAL_DIR_LOCAL, spec["run_key"]) as journal:
+        if not resume:
+            journal.reset()
+        for job, score, source in run_screening(
+            jobs, spec["vina_path"], spec["exhaustiveness"], batch_mode=spec.get("batch_mode", True),
+            cache=DockingResultCache(DOCKING_CACHE_DIR_LOCAL, DOCKING_CACHE_MAX_BYTES) if spec.get("use_cache") else None,
+            on_plan=show_plan, maps_dir=MAPS_DIR_LOCAL if spec.get("use_maps") else None,
+            journal=journal, total_cpus=spec.get("total_cpus")
+        ):
+            rows_by_ligand[job["ligand_name"]][job["target_name"]] = score
+            if source != "journal":
+                results_store.record_result(
+                    run_id, job["ligand_name"], job["target_name"], score, job["output_path"],
+                    elapsed_s=job.get("elapsed_s") if source == "vina" else 0.0, from_cache=source == "cache"
+                )
+            completed += 1
+            cached += source == "cache"
+            resumed += source == "journal"
+            duplicates += source == "duplicate"
+            status.progress(completed / total_tasks, f"Docked {job['ligand_name']} against {job['target_name']} ({completed}/{total_tasks})")
+    results_store.finish_run(run_id)
+
+    return {
+        "run_id": run_id,
+        "docking_results": [
+            {"Ligand": row["Ligand"], **{t: row.get(t, "Error") for t in targets}}
+            for row in rows_by_ligand.values()
+        ],
+        "n_pairs": total_tasks, "n_cached": cached, "n_resumed": resumed, "n_duplicates": duplicates,
+    }
+
+
+def _run_prediction_job(spec, status: _StatusWriter):
+    from .fingerprint_store import FingerprintStore
+    from .ml_prediction import predict_smiles_table
+    from .model_registry import get_model
+    from .paths import FINGERPRINT_STORE_PATH
+
+    status.update(force=True, message="Loading models...")
+    models = {target: get_model(model_path) for target, model_path in spec["models"].items()}
+    status.update(force=True, message=f"Predicting {len(spec['smiles'])} molecule(s)...")
+    rows, invalid = predict_smiles_table(
+        spec["smiles"], models, store=FingerprintStore(FINGERPRINT_STORE_PATH), on_progress=status.progress,
+        n_workers=spec.get("n_workers", 1)
+    )
+    return {"rows": rows, "invalid": invalid}
+
+
+_JOB_RUNNERS = {
+    "docking": _run_docking_job,
+    "prediction": _run_prediction_job,
+}
+
+
+def _execute_job(job_dir):
+    """Worker-process entry point: runs the job described by `job_dir/spec.json`."""
+    job_dir = Path(job_dir)
+    spec = _read_json(job_dir / "spec.json")
+    status = _StatusWriter(job_dir)
+    status.update(force=True, state=RUNNING, started_at=time.time(), pid=os.getpid())
+    try:
+        result = _JOB_RUNNERS[status.status["kind"]](spec, status)
+        _write_json(job_dir / "result.json", result)
+    except Exception as e:
+        status.update(force=True, state=FAILED, finished_at=time.time(), error=f"{type(e).__name__}: {e}",
+                      traceback=traceback.format_exc())
+        return
+    status.update(force=True, state=DONE, progress=1.0, finished_at=time.time(), message="Finished.")
+
+
+def _orphaned(status) -> bool:
+    """True if neither the process that queued the job nor the worker running it is still alive."""
+    owner_pid = status.get("owner_pid")
+    if owner_pid == os.getpid():
+        owner_alive = status.get("owner_token") == _PROCESS_TOKEN
+    else:
+        owner_alive = owner_pid is not None and pid_alive(owner_pid)
+    worker_pid = status.get("pid")
+    worker_alive = worker_pid is not None and worker_pid != os.getpid() and pid_alive(worker_pid)
+    return not (owner_alive or worker_alive)
+
+
+class JobManager:
+    """
+    Queues docking and prediction jobs on a pool of worker processes.
+
+    Each job lives in `jobs_dir/<job id>/` as `spec.json` (the inputs), `status.json`
+    (state, progress and last message, rewritten atomically by the worker) and
+    `result.json` once it finishes. Callers poll `get_status`/`get_result`, so the UI can
+    rerun, reconnect or be used by other sessions while jobs execute. Jobs left queued
+    or running by a process that no longer exists (a stopped server) are marked
+    "interrupted"; a docking job resubmitted with the same inputs resumes from its
+    screening journal.
+    """
+
+    def __init__(self, jobs_dir, max_workers: int = 2):
+        self.jobs_dir = Path(jobs_dir)
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self.max_workers = max(1, max_workers)
+        self._futures = {}
+        self._pins = {}
+        self._lock = threading.Lock()
+        # Spawned workers do not inherit Streamlit's threads or open SQLite handles.
+        self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        for status in self.list_jobs():
+            if status["state"] in (QUEUED, RUNNING) and _orphaned(status):
+                self._set_state(status["job_id"], INTERRUPTED, finished_at=time.time())
+
+    def submit(self, kind: str, spec: dict, label: str | None = None) -> str:
+        """Queues a job of `kind` ("docking" or "prediction") and returns its id."""
+        if kind not in _JOB_RUNNERS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if kind == "docking":
+            # Concurrent docking jobs share the machine instead of each claiming every core
+            spec = {
+                **spec,
+                "jobs": [{k: str(v) if k in _PATH_KEYS else v for k, v in job.items()} for job in spec["jobs"]],
+                "vina_path": str(spec["vina_path"]),
+                "total_cpus": spec.get("total_cpus") or max(1, available_cpu_count() // self.max_workers),
+            }
+        elif kind == "prediction":
+            spec = {**spec, "n_workers": spec.get("n_workers") or max(1, available_cpu_count() // self.max_workers)}
+        job_id = uuid.uuid4().hex[:12]
+        job_dir = self.jobs_dir / job_id
+        job_dir.mkdir()
+        _write_json(job_dir / "spec.json", spec)
+        _write_json(job_dir / "status.json", {
+            "job_id": job_id, "kind": kind, "label": label, "state": QUEUED,
+            "progress": 0.0, "message": "Queued.", "submitted_at": time.time(),
+            "owner_pid": os.getpid(), "owner_token": _PROCESS_TOKEN,
+        })
+        with self._lock:
+            if spec.get("workspace_dir"):
+                # Held by this (long-lived) process from queueing until the job finishes
+                workspace = Workspace(spec["workspace_dir"])
+                self._pins[job_id] = (workspace, workspace.pin(job_id))
+            future = self._pool.submit(_execute_job, str(job_dir))
+            self._futures[job_id] = future
+        future.add_done_callback(lambda f, job_id=job_id: self._on_done(job_id, f))
+        return job_id
+
+    def _on_done(self, job_id, future):
+        with self._lock:
+            self._futures.pop(job_id, None)
+            pin = self._pins.pop(job_id, None)
+        if pin is not None:
+            workspace, pin_path = pin
+            workspace.unpin(pin_path)
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            # The worker process died (e.g. out of memory) before it could record the failure
+            self._set_state(job_id, FAILED, finished_at=time.time(), error=f"{type(error).__name__}: {error}")
+
+    def _set_state(self, job_id, state, **fields):
+        status_path = self.jobs_dir / job_id / "status.json"
+        status = _read_json(status_path) or {"job_id": job_id}
+        if status.get("state") in FINISHED_STATES:
+            return
+        status.update(state=state, updated_at=time.time(), **fields)
+        _write_json(status_path, status)
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancels a job that has not started yet. Returns True if it was cancelled."""
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is None or not future.cancel():
+            return False
+        self._set_state(job_id, CANCELLED, finished_at=time.time(), message="Cancelled.")
+        return True
+
+    def get_status(self, job_id: str) -> dict | None:
+        """Current status dict of a job, or None if it does not exist."""
+        return _read_json(self.jobs_dir / job_id / "status.json")
+
+    def get_result(self, job_id: str) -> dict | None:
+        """Result of a finished job, or None if it has not finished successfully."""
+        return _read_json(self.jobs_dir / job_id / "result.json")
+
+    def list_jobs(self, job_ids=None, kind: str | None = None) -> list[dict]:
+        """Statuses of all jobs (or of `job_ids`), newest first, optionally of one `kind`."""
+        if job_ids is None:
+            job_ids = [p.name for p in self.jobs_dir.iterdir() if p.is_dir()]
+        statuses = [s for s in (self.get_status(job_id) for job_id in job_ids) if s is not None]
+        if kind is not None:
+            statuses = [s for s in statuses if s.get("kind") == kind]
+        return sorted(statuses, key=lambda s: s.get("submitted_at", 0), reverse=True)
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,210 @@
+import csv
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import shutil
+from pathlib import Path
+
+from .ligand_identity import group_duplicates, smiles_inchikeys
+from .ligand_prep import get_ligand_preparer
+
+_NAME_COLUMNS = ("name", "id", "title", "compound_id", "mol_id")
+# Library records read, deduplicated and queued at a time by `prepare_library`
+LIBRARY_CHUNK = 10000
+
+
+def safe_ligand_name(name: str) -> str:
+    """File-system safe ligand name (used for the `<name>.pdbqt` file)."""
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", name.strip()).strip("._") or "ligand"
+
+
+def read_smiles_library(lines, filename: str):
+    """
+    Yields `(name, smiles)` from a `.smi` or `.csv` library, one record at a time.
+
+    `.smi` lines are `SMILES [name]`; `.csv` files need a `smiles` column and may have a
+    name/id/title column. Unnamed molecules are called `lig_<line number>`.
+    """
+    if Path(filename).suffix.lower() == ".csv":
+        reader = csv.DictReader(lines)
+        columns = {c.lower().strip(): c for c in (reader.fieldnames or [])}
+        smiles_col = columns.get("smiles")
+        if smiles_col is None:
+            raise ValueError(f"{filename}: no 'smiles' column found (columns: {', '.join(columns) or 'none'})")
+        name_col = next((columns[c] for c in _NAME_COLUMNS if c in columns), None)
+        for i, row in enumerate(reader, start=1):
+            smiles = (row.get(smiles_col) or "").strip()
+            if smiles:
+                name = (row.get(name_col) or "").strip() if name_col else ""
+                yield name or f"lig_{i}", smiles
+    else:
+        for i, line in enumerate(lines, start=1):
+            parts = line.strip().split(None, 1)
+            if not parts or parts[0].startswith("#") or parts[0].lower() == "smiles":
+                continue
+            name = parts[1].strip() if len(parts) > 1 else ""
+            yield name or f"lig_{i}", parts[0]
+
+
+def _free_stem(name, used: set) -> str:
+    stem = base = safe_ligand_name(name)
+    n = 1
+    while stem.lower() in used:
+        n += 1
+        stem = f"{base}_{n}"
+    used.add(stem.lower())
+    return stem
+
+
+def unique_ligand_names(names) -> list[str]:
+    """`safe_ligand_name` of each name, with `_2`, `_3`, ... added where two would share a file."""
+    used = set()
+    return [_free_stem(name, used) for name in names]
+
+
+def _prep_key(smiles, options) -> str:
+    """Hash of what a PDBQT was prepared from: the input SMILES and the preparation options."""
+    return hashlib.sha256(json.dumps([smiles, *options]).encode('utf-8')).hexdigest()
+
+
+def _key_path(pdbqt_path: Path) -> Path:
+    return pdbqt_path.with_name(f".{pdbqt_path.name}.key")
+
+
+def _write_atomic(path: Path, text: str):
+    # Write under a temporary name and rename, so a partially written file is never
+    # picked up as a prepared ligand.
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(text)
+    os.replace(tmp_path, path)
+
+
+def _is_prepared(pdbqt_path: Path, key: str) -> bool:
+    """True if `pdbqt_path` exists and was prepared from exactly the inputs hashed in `key`."""
+    try:
+        return pdbqt_path.stat().st_size > 0 and _key_path(pdbqt_path).read_text().strip() == key
+    except OSError:
+        return False
+
+
+# Per-worker preparation options, set once by the pool initializer
+_worker_options = None
+
+
+def _init_worker(ph, skip_tautomers, skip_acidbase):
+    global _worker_options
+    _worker_options = (ph, skip_tautomers, skip_acidbase)
+
+
+def _prepare_record(task):
+    name, smiles, stem, output_dir, skip_existing = task
+    pdbqt_path = Path(output_dir) / f"{stem}.pdbqt"
+    result = {"name": name, "smiles": smiles, "pdbqt_path": None, "error": None, "duplicate_of": None}
+    key = _prep_key(smiles, _worker_options)
+    # Reuse only a file prepared from the same SMILES and options, not just one with this name
+    if skip_existing and _is_prepared(pdbqt_path, key):
+        result["pdbqt_path"] = str(pdbqt_path)
+        return result
+    try:
+        pdbqt_string = get_ligand_preparer(*_worker_options).smiles_to_pdbqt_string(smiles)
+        _key_path(pdbqt_path).unlink(missing_ok=True)
+        _write_atomic(pdbqt_path, pdbqt_string)
+        _write_atomic(_key_path(pdbqt_path), key)
+        result["pdbqt_path"] = str(pdbqt_path)
+    except Exception as e:
+        result["error"] = str(e) or type(e).__name__
+    return result
+
+
+def _duplicate_results(result, duplicates, output_dir, options):
+    """Yields a result for each `(name, smiles, stem)` record that repeats the compound of `result`, each with its own copy of the PDBQT."""
+    for name, smiles, stem in duplicates:
+        duplicate = {"name": name, "smiles": smiles, "pdbqt_path": None, "error": result["error"], "duplicate_of": result["name"]}
+        if result["pdbqt_path"]:
+            pdbqt_path = Path(output_dir) / f"{stem}.pdbqt"
+            if pdbqt_path != Path(result["pdbqt_path"]):
+                tmp_path = pdbqt_path.with_name(f".{pdbqt_path.name}.{os.getpid()}.tmp")
+                shutil.copyfile(result["pdbqt_path"], tmp_path)
+                os.replace(tmp_path, pdbqt_path)
+                _write_atomic(_key_path(pdbqt_path), _prep_key(smiles, options))
+            duplicate["pdbqt_path"] = str(pdbqt_path)
+        yield duplicate
+
+
+def _record_chunks(records, size):
+    """`(name, smiles, stem)` records in lists of up to `size`, with stems unique across the whole library."""
+    used = set()
+    chunk = []
+    for name, smiles in records:
+        chunk.append((name, smiles, _free_stem(name, used)))
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def prepare_library(records, output_dir, n_workers, ph=7.4, skip_tautomers=False, skip_acidbase=False,
+                    chunksize=64, skip_existing=True, dedupe=True):
+    """
+    Prepares `(name, smiles)` records into `output_dir/<name>.pdbqt` across `n_workers` processes.
+
+    `records` may be any iterable (e.g. `read_smiles_library` over an open file): it is
+    consumed `LIBRARY_CHUNK` records at a time, so a large library is never held in
+    memory whole. Each worker keeps its own `LigandPreparer` and writes its PDBQT files
+    directly, so results land on disk as they finish; `chunksize` caps how many records
+    a worker takes at once. Names that map to the same file get a numeric suffix (see
+    `unique_ligand_names`). With `skip_existing`, a PDBQT is reused only if a
+    `.<name>.pdbqt.key` file beside it shows it was prepared from the same SMILES and
+    options. Yields one dict per molecule, in completion
+    order, with `name`, `smiles`, `pdbqt_path` (None on failure), `error` and
+    `duplicate_of`. With `dedupe`, records of the same compound (same InChIKey after
+    standardization, see `smiles_inchikeys`) are prepared once; the others get a copy of
+    that PDBQT under their own name and `duplicate_of` set to the prepared record's name.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    options = (float(ph), bool(skip_tautomers), bool(skip_acidbase))
+    _init_worker(*options)
+    pool = None
+    # InChIKey -> result of the record prepared for it, for repeats in later chunks
+    prepared = {}
+    try:
+        for chunk in _record_chunks(records, LIBRARY_CHUNK):
+            if pool is None:
+                # Sized on the first chunk: only a library smaller than one chunk has fewer records than workers
+                n_workers = min(n_workers, len(chunk))
+            if pool is None and n_workers > 1:
+                # "spawn" keeps workers independent of the (multi-threaded) web server process
+                pool = multiprocessing.get_context("spawn").Pool(n_workers, initializer=_init_worker, initargs=options)
+            keys = [None] * len(chunk)
+            if dedupe:
+                keys = smiles_inchikeys([smiles for _, smiles, _ in chunk], n_workers=n_workers)
+            duplicates = {}
+            tasks = []
+            for group in group_duplicates(range(len(chunk)), keys.__getitem__):
+                key, members = keys[group[0]], [chunk[i] for i in group]
+                if key in prepared:
+                    yield from _duplicate_results(prepared[key], members, output_dir, options)
+                    continue
+                name, smiles, stem = members[0]
+                duplicates[name, smiles] = (key, members[1:])
+                tasks.append((name, smiles, stem, str(output_dir), skip_existing))
+
+            if pool is None:
+                results = map(_prepare_record, tasks)
+            else:
+                task_chunksize = max(1, min(chunksize, len(tasks) // (n_workers * 8)))
+                results = pool.imap_unordered(_prepare_record, tasks, chunksize=task_chunksize)
+            for result in results:
+                key, members = duplicates.pop((result["name"], result["smiles"]), (None, ()))
+                if key is not None:
+                    prepared[key] = {"name": result["name"], "pdbqt_path": result["pdbqt_path"], "error": result["error"]}
+                yield result
+                yield from _duplicate_results(result, members, output_dir, options)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
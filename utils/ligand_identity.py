@@ -0,0 +1,108 @@
+import threading
+
+from .hashing import file_sha256
+
+# Process-wide: ligand file content hash -> identity key.
+_file_identities = {}
+_identity_lock = threading.Lock()
+
+# Built once on first use; RDKit's Uncharger is costly to construct
+_uncharger = None
+
+
+def inchikey(smiles) -> str | None:
+    """
+    InChIKey of `smiles` after neutralizing it, or None if RDKit cannot parse it.
+
+    `standardize_smiles` uncharges before it strips counter-ions, so a salt's parent can
+    stay charged; neutralizing here gives the salt and the free form the same key.
+    """
+    global _uncharger
+    from rdkit import Chem
+    from rdkit.Chem.MolStandardize import rdMolStandardize
+
+    if _uncharger is None:
+        _uncharger = rdMolStandardize.Uncharger()
+    try:
+        mol = Chem.MolFromSmiles(smiles)
+        if mol is None:
+            return None
+        key = Chem.MolToInchiKey(_uncharger.uncharge(mol))
+    except Exception:
+        return None
+    return key or None
+
+
+def smiles_inchikey(smiles, stereo: bool = True) -> str | None:
+    """
+    InChIKey of the standardized form of `smiles`, or None if it cannot be standardized.
+
+    Salts, charge states and the tautomers standard InChI normalizes map to the same key.
+    With `stereo=False`, stereoisomers do too (as they do for ECFP4 fingerprints).
+    """
+    from .standardization import standardize_smiles
+
+    try:
+        std_smiles = standardize_smiles(smiles, isomeric=stereo)
+    except Exception:
+        return None
+    return inchikey(std_smiles) if std_smiles else None
+
+
+def smiles_inchikeys(smiles_list, stereo: bool = True, n_workers: int = 1) -> list:
+    """`smiles_inchikey` for many SMILES, standardized on up to `n_workers` processes."""
+    from .standardization import standardize_batch
+
+    return [
+        inchikey(result["smiles"]) if result["smiles"] else None
+        for result in standardize_batch(smiles_list, n_workers=n_workers, isomeric=stereo)
+    ]
+
+
+def pdbqt_smiles(path) -> str | None:
+    """SMILES from the `REMARK SMILES` header meeko writes into ligand PDBQT files."""
+    with open(path, 'r') as f:
+        for line in f:
+            if line.startswith(("ROOT", "ATOM", "HETATM")):
+                break
+            if line.startswith("REMARK SMILES ") and not line.startswith("REMARK SMILES IDX"):
+                return line[len("REMARK SMILES "):].strip() or None
+    return None
+
+
+def ligand_file_identity(path) -> str:
+    """
+    Identity of the compound in a ligand PDBQT file: the InChIKey of its `REMARK SMILES`
+    header, or `sha256:<content hash>` for files without one (only identical files then
+    match). Memoized by file content hash.
+    """
+    digest = file_sha256(path)
+    with _identity_lock:
+        key = _file_identities.get(digest)
+    if key is None:
+        smiles = pdbqt_smiles(path)
+        key = (smiles_inchikey(smiles) if smiles else None) or f"sha256:{digest}"
+        with _identity_lock:
+            _file_identities[digest] = key
+    return key
+
+
+def group_duplicates(items, key) -> list[list]:
+    """
+    Groups `items` that share `key(item)`, in order of first appearance.
+
+    Returns a list of groups, each `[representative, *aliases]` with the first item of
+    the group as its representative; items whose key is None are never grouped.
+    """
+    groups = []
+    by_key = {}
+    for item in items:
+        k = key(item)
+        if k is None:
+            groups.append([item])
+        elif k in by_key:
+            by_key[k].append(item)
+        else:
+            by_key[k] = [item]
+            groups.append(by_key[k])
+    return groups
@@ -0,0 +1,157 @@
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import zipfile
+from pathlib import Path
+
+from .hashing import file_sha256
+
+LIGAND_SUFFIX = ".pdbqt"
+_CHUNK = 1 << 20
+
+
+class LigandFileIndex:
+    """
+    SQLite index of the content hashes of the ligand files in one directory.
+
+    `sync` brings it up to date with the directory, hashing only files that are new or
+    changed since the last sync (by size and mtime), so checking an upload against tens
+    of thousands of prepared ligands does not re-read them. Safe to share between
+    threads and processes.
+    """
+
+    def __init__(self, db_path, ligand_dir):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.ligand_dir = Path(ligand_dir)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "name TEXT PRIMARY KEY, sha256 TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS files_sha256 ON files (sha256)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def sync(self):
+        """Indexes files added or changed in the directory and forgets deleted ones."""
+        self.ligand_dir.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        known = {name: (size, mtime_ns) for name, size, mtime_ns in conn.execute("SELECT name, size, mtime_ns FROM files")}
+        changed = []
+        with os.scandir(self.ligand_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith(LIGAND_SUFFIX) or entry.name.startswith(".") or not entry.is_file():
+                    continue
+                st_info = entry.stat()
+                if known.pop(entry.name, None) != (st_info.st_size, st_info.st_mtime_ns):
+                    changed.append((entry.name, file_sha256(entry.path), st_info.st_size, st_info.st_mtime_ns))
+        with conn:
+            conn.executemany("DELETE FROM files WHERE name = ?", [(name,) for name in known])
+            conn.executemany("INSERT OR REPLACE INTO files (name, sha256, size, mtime_ns) VALUES (?, ?, ?, ?)", changed)
+
+    def find(self, digest) -> str | None:
+        """Path of an indexed file with content hash `digest` that still exists, or None."""
+        for (name,) in self._connect().execute("SELECT name FROM files WHERE sha256 = ?", (digest,)):
+            path = os.path.join(self.ligand_dir, name)
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def add(self, path, digest):
+        """Indexes a file written to the directory; visible to `find` at once, stored on `commit`."""
+        st_info = os.stat(path)
+        self._connect().execute(
+            "INSERT OR REPLACE INTO files (name, sha256, size, mtime_ns) VALUES (?, ?, ?, ?)",
+            (os.path.basename(path), digest, st_info.st_size, st_info.st_mtime_ns)
+        )
+
+    def commit(self):
+        self._connect().commit()
+
+
+def _free_path(ligand_dir, name: str, digest: str) -> str:
+    """`name` in `ligand_dir`, or `<stem>_<hash prefix>.pdbqt` if a different file already has that name."""
+    path = os.path.join(ligand_dir, name)
+    if not os.path.exists(path):
+        return path
+    return os.path.join(ligand_dir, f"{name[:-len(LIGAND_SUFFIX)]}_{digest[:8]}{LIGAND_SUFFIX}")
+
+
+def _ingest_stream(stream, name, index: LigandFileIndex) -> dict:
+    """Streams one ligand file into the indexed directory unless identical content is already there."""
+    ligand_dir = str(index.ligand_dir)
+    h = hashlib.sha256()
+    # Ligand files are small: they stay in memory until hashed, and only larger ones spill to disk
+    with tempfile.SpooledTemporaryFile(max_size=_CHUNK, dir=ligand_dir) as spool:
+        for chunk in iter(lambda: stream.read(_CHUNK), b''):
+            h.update(chunk)
+            spool.write(chunk)
+        digest = h.hexdigest()
+        existing = index.find(digest)
+        if existing is not None:
+            return {"name": name, "path": existing, "status": "existing"}
+
+        path = _free_path(ligand_dir, name, digest)
+        tmp_path = os.path.join(ligand_dir, f".{os.path.basename(path)}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            spool.seek(0)
+            with open(tmp_path, 'wb') as out:
+                shutil.copyfileobj(spool, out, _CHUNK)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+    index.add(path, digest)
+    return {"name": name, "path": path, "status": "added"}
+
+
+def _archive_members(archive: zipfile.ZipFile):
+    for info in archive.infolist():
+        name = Path(info.filename).name
+        if info.is_dir() or not name.lower().endswith(LIGAND_SUFFIX) or name.startswith("."):
+            continue
+        if "__MACOSX/" in info.filename:
+            continue
+        yield info, f"{Path(name).stem}{LIGAND_SUFFIX}"
+
+
+def ingest_ligand_upload(fileobj, filename, index: LigandFileIndex, on_progress=None) -> list[dict]:
+    """
+    Adds an uploaded `.pdbqt` file, or every `.pdbqt` member of a `.zip`, to the indexed
+    ligand directory.
+
+    Members are streamed from the archive straight to their final location (nothing is
+    extracted elsewhere or held in memory whole), and files whose content is already in
+    the directory are not written again. Returns one dict per ligand with `name`, `path`
+    (of the new or the already present file) and `status` ("added" or "existing").
+    `on_progress(done, total)` is called after each archive member.
+    """
+    index.sync()
+    try:
+        if not filename.lower().endswith(".zip"):
+            return [_ingest_stream(fileobj, Path(filename).name, index)]
+
+        results = []
+        with zipfile.ZipFile(fileobj) as archive:
+            members = list(_archive_members(archive))
+            for done, (info, name) in enumerate(members, start=1):
+                with archive.open(info) as stream:
+                    results.append(_ingest_stream(stream, name, index))
+                if on_progress is not None:
+                    on_progress(done, len(members))
+        return results
+    finally:
+        # One commit per upload rather than per ligand
+        index.commit()
@@ -0,0 +1,74 @@
+import functools
+import threading
+from pathlib import Path
+
+from rdkit import Chem
+
+
+class LigandPreparer:
+    """
+    In-process ligand preparation: protonation/3D embedding with molscrub, then PDBQT
+    writing with meeko.
+
+    Replaces running `scrub.py` and `mk_prepare_ligand.py` as two Python subprocesses
+    per molecule. The `Scrub` and `MoleculePreparation` objects are built once and
+    reused, and molecules are passed between them directly instead of through an SDF.
+    """
+
+    def __init__(self, ph=7.4, skip_tautomers=False, skip_acidbase=False):
+        from molscrub import Scrub
+        from meeko import MoleculePreparation
+
+        # Same settings the scrub.py / mk_prepare_ligand.py defaults used
+        self.scrub = Scrub(
+            ph_low=ph,
+            ph_high=ph,
+            skip_tautomers=skip_tautomers,
+            skip_acidbase=skip_acidbase,
+            max_ff_iter=200,
+        )
+        self.preparator = MoleculePreparation()
+        self._lock = threading.Lock()
+
+    def mol_to_pdbqt_string(self, mol) -> str:
+        """PDBQT text for an RDKit molecule that already has explicit Hs and 3D coordinates."""
+        from meeko import PDBQTWriterLegacy
+
+        with self._lock:
+            mol_setups = self.preparator.prepare(mol)
+        pdbqt_string, is_ok, error_msg = PDBQTWriterLegacy.write_string(mol_setups[0])
+        if not is_ok:
+            raise ValueError(f"meeko could not write PDBQT: {error_msg}")
+        return pdbqt_string
+
+    def smiles_to_pdbqt_string(self, smiles) -> str:
+        """Protonates and embeds a SMILES string and returns the first isomer as PDBQT text."""
+        mol = Chem.MolFromSmiles(smiles)
+        if mol is None:
+            raise ValueError(f"Could not parse SMILES '{smiles}'")
+        with self._lock:
+            isomers = self.scrub(mol)
+        if not isomers:
+            raise ValueError(f"Scrub produced no 3D isomer for '{smiles}'")
+        return self.mol_to_pdbqt_string(isomers[0])
+
+    def file_to_pdbqt_string(self, ligand_file_path) -> str:
+        """PDBQT text for the first molecule of a 3D .sdf/.mol file (explicit Hs required)."""
+        supplier = Chem.SDMolSupplier(str(ligand_file_path), removeHs=False)
+        mol = next((m for m in supplier if m is not None), None)
+        if mol is None:
+            raise ValueError(f"No readable molecule in {Path(ligand_file_path).name}")
+        return self.mol_to_pdbqt_string(mol)
+
+
+@functools.lru_cache(maxsize=8)
+def get_ligand_preparer(ph=7.4, skip_tautomers=False, skip_acidbase=False) -> LigandPreparer:
+    """Shared `LigandPreparer` per option set, built on first use."""
+    return LigandPreparer(ph, skip_tautomers, skip_acidbase)
+
+
+def write_pdbqt(pdbqt_string, output_path) -> Path:
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(pdbqt_string)
+    return output_path
@@ -6,7 +6,9 @@ import json
 import multiprocessing
 from os import linesep
 import pathlib
+import shutil
 import sys
+import tempfile
 
 #from scrubber import Scrub
 from molscrub import Scrub
@@ -35,12 +37,30 @@ class SDWriter:
         self.filename = filename
 
     def __enter__(self):
-        self.rdkit_sdwriter = Chem.SDWriter(self.filename)
+        self.file = open(self.filename, "w")
+        self.rdkit_sdwriter = Chem.SDWriter(self.file)
         self.counter_mol_group = 0
         return self
 
     def __exit__(self, *args):
         self.rdkit_sdwriter.close()
+        self.file.close()
+
+    def merge_shard(self, filename):
+        """append the records of another .sdf written by SDWriter, renumbering its groups"""
+        self.rdkit_sdwriter.flush()
+        nr_groups = 0
+        with open(filename) as shard:
+            is_scrubinfo = False
+            for line in shard:
+                if is_scrubinfo:
+                    info = json.loads(line)
+                    nr_groups = info["isomerGroup"] + 1
+                    info["isomerGroup"] += self.counter_mol_group
+                    line = json.dumps(info) + "\n"
+                is_scrubinfo = line.startswith(">") and "<ScrubInfo>" in line
+                self.file.write(line)
+        self.counter_mol_group += nr_groups
 
     def write_mols(self, mol_group, add_suffix=False, add_serial_suffix=False):
 
@@ -81,46 +101,83 @@ class SDWriter:
 
 
 class HDF5Writer:
+    """buffers molecules in memory and appends them to the datasets in large blocks,
+        instead of resizing both datasets once per molecule"""
 
-    def __init__(self, filename):
+    def __init__(self, filename, buffer_size=10000, chunk_size=4096, compression=None):
         self.filename = filename
+        self.buffer_size = max(1, buffer_size)
+        self.chunk_size = max(1, chunk_size)
+        self.compression = compression
 
     def __enter__(self):
         self.h5file = h5py.File(self.filename, "w")
         dt = h5py.string_dtype()
-        self.mols = self.h5file.create_dataset("mols", (0,), maxshape=(None,), dtype=dt, chunks=True)
-        self.group_id = self.h5file.create_dataset("group_id", (0,), maxshape=(None,), dtype="i8", chunks=True)
+        self.mols = self.h5file.create_dataset(
+            "mols", (0,), maxshape=(None,), dtype=dt,
+            chunks=(self.chunk_size,), compression=self.compression)
+        self.group_id = self.h5file.create_dataset(
+            "group_id", (0,), maxshape=(None,), dtype="i8",
+            chunks=(self.chunk_size,), compression=self.compression)
+        self.mols_buffer = []
+        self.group_id_buffer = []
         self.counter_mol_group = 0
         return self
 
     def __exit__(self, *args):
-        self.h5file.close()
+        try:
+            self.flush()
+        finally:
+            self.h5file.close()
+
+    def flush(self):
+        """append buffered molecules with a single resize per dataset"""
+        n = len(self.mols_buffer)
+        if n == 0:
+            return
+        index = self.mols.shape[0]
+        self.mols.resize((index + n, ))
+        self.mols[index:index + n] = self.mols_buffer
+        self.group_id.resize((index + n, ))
+        self.group_id[index:index + n] = self.group_id_buffer
+        self.mols_buffer = []
+        self.group_id_buffer = []
 
     def write_mols(self, mol_group, add_suffix=False, add_serial_suffix=False):
-        nr_isomers = len(isomer_list)
-        serial_suffix = 0
+
+        add_suffix |= add_serial_suffix
+        if add_suffix and len(mol_group) > 0:
+            if mol_group[0].HasProp("_Name"):
+                name = mol_group[0].GetProp("_Name") # assumes all mols have same name, which they should
+            else:
+                name = ""
+        nr_isomers = len(mol_group)
         for i, mol in enumerate(mol_group):
-            nr_confs = mol.GetNumConformers()
+            # all conformers of an isomer are stored in one JSON record
             if add_serial_suffix:
-                if nr_isomers > 1 or nr_confs > 1:
-                    serial_suffix += 1
-                    mol.SetProp("_Name", name + "_%d" % serial_suffix)
+                if nr_isomers > 1:
+                    mol.SetProp("_Name", name + "_%d" % (i + 1))
             elif add_suffix:
-                if mol.HasProp("_Name"):
-                    name = mol.GetProp("_Name")
-                else:
-                    name = ""
-                if len(mol_group) > 1:
-                    suffix = "_i%d" % len(mol_group)
-                else:
-                    suffix = ""
-                mol.SetProp("_Name", name + suffix)
-            index = self.mols.shape[0]
-            self.mols.resize((index + 1, ))
-            self.mols[index] = rdMolInterchange.MolToJSON(mol)
-            self.group_id.resize((index + 1, ))
-            self.group_id[index] = self.counter_mol_group
+                if nr_isomers > 1:
+                    mol.SetProp("_Name", name + "_i%d" % i)
+            self.mols_buffer.append(rdMolInterchange.MolToJSON(mol))
+            self.group_id_buffer.append(self.counter_mol_group)
         self.counter_mol_group += 1
+        if len(self.mols_buffer) >= self.buffer_size:
+            self.flush()
+
+    def merge_shard(self, filename):
+        """append the molecules of another .hdf5 written by HDF5Writer, renumbering its groups"""
+        with h5py.File(filename, "r") as shard:
+            mols = shard["mols"].asstr()
+            group_id = shard["group_id"]
+            for start in range(0, mols.shape[0], self.buffer_size):
+                stop = start + self.buffer_size
+                self.mols_buffer.extend(mols[start:stop])
+                self.group_id_buffer.extend(group_id[start:stop] + self.counter_mol_group)
+                self.flush()
+            if group_id.shape[0]:
+                self.counter_mol_group += int(group_id[-1]) + 1
 
 
 class MolSupplier:
@@ -214,6 +271,11 @@ basic.add_argument("--skip_gen3d", help="skip generation of 3D coordinates (also
 
 misc = parser_essential.add_argument_group("miscellaneous")
 misc.add_argument("--cpu", help="number of processes to run in parallel", default=0, type=int)
+misc.add_argument("--chunksize", help="molecules sent to a worker process at a time", default=16, type=int)
+misc.add_argument("--ordered", help="write molecules in input order when running in parallel", action="store_true")
+misc.add_argument("--shards", help="split the input file (.sdf/.smi/.cxsmiles) into this many shards; "
+                  "each worker writes its own output shard and they are merged in input order (default: off)",
+                  default=0, type=int)
 misc.add_argument("--debug", help="errors are raised", action="store_true")
 misc.add_argument("-h", "--help", help="show this help message and exit", action="help")
 misc.add_argument("--help_advanced", help="show advanced options and exit", action="store_true")
@@ -232,6 +294,11 @@ geom.add_argument("--ff", help="uff, mmff94, mmff94s, espaloma", choices=["uff",
 geom.add_argument("--template", help="Template molecule for 3D embedding with constraints")
 geom.add_argument("--template_smarts", help="SMARTs patter matching atoms of template and query molecules for 3D embedding")
 
+hdf5 = parser_advanced.add_argument_group("hdf5 output")
+hdf5.add_argument("--hdf5_buffer", help="number of molecules kept in memory between writes to the .hdf5", type=int, default=10000)
+hdf5.add_argument("--hdf5_chunk", help="number of molecules per HDF5 chunk", type=int, default=4096)
+hdf5.add_argument("--hdf5_compression", help="compression filter for .hdf5 datasets", choices=["gzip", "lzf"])
+
 misc2 = parser_advanced.add_argument_group("more miscellaneous options")
 misc2.add_argument("--wcg", help="make sure mol names and suffixes are integers", action="store_true")
 
@@ -313,6 +380,7 @@ if args.wcg or args.name_from_prop:
 
 # output
 do_gen2d = False # if output SDF and skip_gen3d, we will need 2D conformers
+writer_kwargs = {}
 extension = pathlib.Path(args.out_fname).suffix
 if extension == ".sdf":
     Writer = SDWriter
@@ -321,6 +389,11 @@ if extension == ".sdf":
 elif extension == ".hdf5":
     if _got_h5py:
         Writer = HDF5Writer
+        writer_kwargs = {
+            "buffer_size": args.hdf5_buffer,
+            "chunk_size": args.hdf5_chunk,
+            "compression": args.hdf5_compression,
+        }
     else:
         print(_h5py_import_error, file=sys.stderr)
         print("Could not import h5py. Install h5py to write .hdf5")
@@ -356,7 +429,7 @@ counter = {
     "failed": 0,
 }
 
-def scrub_and_catch_errors(input_mol, sdwriter_failed_mols=None):
+def scrub_and_catch_errors(input_mol):
     log = {}
     if input_mol is None:
         log["input_mol_none"] = True
@@ -366,20 +439,21 @@ def scrub_and_catch_errors(input_mol, sdwriter_failed_mols=None):
         try:
             isomer_list = scrub(input_mol)
         except Exception as e:
-            log["exception"] = e
-            isomer_list = []
-            if sdwriter_failed_mols is not None:
+            # returned to whoever writes the output, so failures are
+            # captured from worker processes too
+            log["exception"] = str(e)
+            if args.write_failed_mols is not None:
                 input_mol.SetProp("exception", str(e))
-                sdwriter_failed_mols.write(input_mol)
-                sdwriter_failed_mols.flush() # slow?
+                log["failed_mol"] = input_mol
+            isomer_list = []
     return (isomer_list, log)
 
-def scrub_and_debug(input_mol, _=None):
+def scrub_and_debug(input_mol):
     log = {"input_mol_none": input_mol is None}
     isomer_list = scrub(input_mol)
     return (isomer_list, log)
 
-def write_and_log(isomer_list, log, counter):
+def write_and_log(isomer_list, log, counter, w, sdwriter_failed_mols=None, verbose=True):
     counter["supplied"] += 1
     if log["input_mol_none"]:
         counter["rdkit_nope"] += 1
@@ -393,14 +467,118 @@ def write_and_log(isomer_list, log, counter):
             return
         counter["isomers"] += len(isomer_list)
         counter["conformers"] += sum([mol.GetNumConformers() for mol in isomer_list])
-        if counter["supplied"] % 100 == 0:
+        if verbose and counter["supplied"] % 100 == 0:
             print("Scrub in progress. Here's how things are going:")
             print(get_info_str(counter))
     else:
         counter["failed"] += 1
         if "exception" in log:
             print(log["exception"], file=sys.stderr)
+        if sdwriter_failed_mols is not None and "failed_mol" in log:
+            sdwriter_failed_mols.write(log["failed_mol"])
+
+def find_shards(fname, nr_shards):
+    """byte ranges splitting an .sdf/.smi/.cxsmiles file into contiguous shards with
+        about the same number of records each"""
+    is_sdf = pathlib.Path(fname).suffix == ".sdf"
+    offsets = []
+    with open(fname, "rb") as f:
+        if pathlib.Path(fname).suffix == ".cxsmiles":
+            f.readline() # title line
+        pos = f.tell()
+        record_start = pos
+        in_record = False
+        for line in f:
+            if is_sdf:
+                in_record |= bool(line.strip())
+                if line.startswith(b"$$$$"):
+                    offsets.append(record_start)
+                    record_start = pos + len(line)
+                    in_record = False
+            elif line.strip():
+                offsets.append(pos)
+            pos += len(line)
+        if in_record:
+            offsets.append(record_start) # last record without $$$$
+    nr_shards = max(1, min(nr_shards, len(offsets)))
+    starts = [offsets[len(offsets) * i // nr_shards] for i in range(nr_shards)] if offsets else [pos]
+    return list(zip(starts, starts[1:] + [pos]))
+
+def read_shard(fname, start, end):
+    """molecules of the records between byte offsets `start` and `end`"""
+    with open(fname, "rb") as f:
+        f.seek(start)
+        text = f.read(end - start).decode()
+    extension = pathlib.Path(fname).suffix
+    if extension == ".sdf":
+        shard_supplier = Chem.SDMolSupplier()
+        shard_supplier.SetData(text)
+        yield from shard_supplier
+        return
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            if extension == ".cxsmiles":
+                smiles, name, _ = line.split("\t", maxsplit=2)
+                mol = Chem.MolFromSmiles(smiles)
+                mol.SetProp("_Name", name)
+            else:
+                mol = Chem.MolFromSmiles(line)
+        except Exception:
+            mol = None
+        yield mol
+
+def scrub_shard(shard):
+    """worker side of --shards: scrub one input shard into its own output file"""
+    index, start, end, fname, failed_fname = shard
+    shard_counter = dict.fromkeys(counter, 0)
+    shard_failures = Chem.SDWriter(failed_fname) if failed_fname is not None else None
+    try:
+        with Writer(fname, **writer_kwargs) as shard_writer:
+            for input_mol in read_shard(args.input, start, end):
+                if input_mol is not None and args.name_from_prop:
+                    input_mol.SetProp("_Name", input_mol.GetProp(args.name_from_prop))
+                isomer_list, log = scrub_fn(input_mol)
+                write_and_log(isomer_list, log, shard_counter, shard_writer, shard_failures, verbose=False)
+    finally:
+        if shard_failures is not None:
+            shard_failures.close()
+    return index, shard_counter
+
+def run_sharded(w, nr_proc):
+    shard_dir = tempfile.mkdtemp(prefix=".scrub_shards_", dir=pathlib.Path(args.out_fname).resolve().parent)
+    try:
+        out_suffix = pathlib.Path(args.out_fname).suffix
+        shards = [
+            (i, start, end, str(pathlib.Path(shard_dir) / ("shard%06d%s" % (i, out_suffix))),
+             str(pathlib.Path(shard_dir) / ("failed%06d.sdf" % i)) if failures_file is not None else None)
+            for i, (start, end) in enumerate(find_shards(args.input, args.shards))
+        ]
+        with multiprocessing.Pool(min(nr_proc, len(shards))) as p:
+            for nr_done, (index, shard_counter) in enumerate(p.imap_unordered(scrub_shard, shards), 1):
+                for key, value in shard_counter.items():
+                    counter[key] += value
+                print("Shard %d/%d done." % (nr_done, len(shards)))
+                print(get_info_str(counter))
+        for shard in shards:
+            w.merge_shard(shard[3])
+            if failures_file is not None:
+                sdwriter_failures.flush()
+                with open(shard[4]) as f:
+                    shutil.copyfileobj(f, failures_file)
+    finally:
+        shutil.rmtree(shard_dir, ignore_errors=True)
+
+if args.shards > 0:
+    if pathlib.Path(args.input).suffix not in (".sdf", ".smi", ".cxsmiles"):
+        print("--shards needs an input file (.sdf/.smi/.cxsmiles), exiting", file=sys.stderr)
+        sys.exit(2)
+    if args.wcg:
+        print("--wcg does not work with --shards, exiting", file=sys.stderr)
+        sys.exit(2)
 
+failures_file = None
 if args.debug and args.write_failed_mols:
     print("--write_failed_mols does not work with --debug, exiting", file=sys.stderr)
     sys.exit(2)
@@ -410,33 +588,38 @@ elif args.debug:
     scrub_fn = scrub_and_debug
     sdwriter_failures = None
 elif args.write_failed_mols is not None:
-    if args.cpu != 1:
-        print("--write_failed_mols does not work with multiprocessing, needs --cpu 1, exiting", file=sys.stderr)
-        sys.exit(2)
+    # workers return failed molecules; only the main process writes this file
     scrub_fn = scrub_and_catch_errors
-    sdwriter_failures = Chem.SDWriter(args.write_failed_mols)
+    failures_file = open(args.write_failed_mols, "w")
+    sdwriter_failures = Chem.SDWriter(failures_file)
 else:
     scrub_fn = scrub_and_catch_errors
     sdwriter_failures = None
 
 if __name__ == '__main__':
-    with Writer(args.out_fname) as w:
-        if args.cpu == 1:
+    if args.cpu < 1:
+        nr_proc = multiprocessing.cpu_count()
+    else:
+        nr_proc = args.cpu
+    with Writer(args.out_fname, **writer_kwargs) as w:
+        if args.shards > 0:
+            run_sharded(w, nr_proc) # workers write, the main process only merges
+        elif args.cpu == 1:
             for input_mol in supplier:
-                isomer_list, log = scrub_fn(input_mol, sdwriter_failures)
-                write_and_log(isomer_list, log, counter)
+                isomer_list, log = scrub_fn(input_mol)
+                write_and_log(isomer_list, log, counter, w, sdwriter_failures)
         else:
-            if args.cpu < 1:
-                nr_proc = multiprocessing.cpu_count()
-            else:
-                nr_proc = args.cpu
             p = multiprocessing.Pool(nr_proc - 1) # leave 1 for main process
-            for (isomer_list, log) in p.imap_unordered(scrub_fn, supplier):
-                write_and_log(isomer_list, log, counter)
+            imap = p.imap if args.ordered else p.imap_unordered
+            # a generator: Pool re-calls iter() per chunk and SMIMolSupplierWrapper.__iter__ rewinds
+            mols = (input_mol for input_mol in supplier)
+            for (isomer_list, log) in imap(scrub_fn, mols, chunksize=max(1, args.chunksize)):
+                write_and_log(isomer_list, log, counter, w, sdwriter_failures)
 
 
     if sdwriter_failures is not None:
         sdwriter_failures.close()
+        failures_file.close()
 
     print("Scrub completed.\nSummary of what happened:")
     print(get_info_str(counter), end="")
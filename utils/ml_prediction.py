@@ -0,0 +1,128 @@
+import numpy as np
+from rdkit import Chem, DataStructs
+from rdkit.Chem import AllChem
+
+from .ligand_identity import group_duplicates
+from .standardization import standardize_batch
+
+ECFP4_RADIUS = 2
+ECFP4_BITS = 2048
+# Same decision rule as the classifiers' own `predict` for binary problems
+ACTIVE_PROBABILITY_THRESHOLD = 0.5
+PREDICTION_CHUNK_SIZE = 4096
+
+
+def calculate_ecfp4(smiles):
+    """Calculates ECFP4 fingerprint (2048 bits) from SMILES."""
+    try:
+        mol = Chem.MolFromSmiles(smiles)
+        if mol:
+            fp = AllChem.GetMorganFingerprintAsBitVect(mol, ECFP4_RADIUS, nBits=ECFP4_BITS)
+            return np.array(fp)
+    except:
+        return None
+    return None
+
+
+def fingerprint_matrix(smiles_list, store=None):
+    """
+    ECFP4 bits for many SMILES as one `(n, 2048)` uint8 matrix.
+
+    Returns `(X, valid)` where `valid[i]` is False for SMILES RDKit could not parse; those
+    rows are left as zeros and should be dropped before prediction. With a
+    `FingerprintStore`, known SMILES are read from it in bulk and only new ones are
+    computed and then appended to it.
+    """
+    X = np.zeros((len(smiles_list), ECFP4_BITS), dtype=np.uint8)
+    valid = np.zeros(len(smiles_list), dtype=bool)
+    stored = store.get_many(smiles_list) if store is not None else {}
+    computed = {}
+    for i, smiles in enumerate(smiles_list):
+        bits = stored.get(smiles)
+        if bits is None:
+            bits = computed.get(smiles)
+        if bits is not None:
+            X[i] = bits
+            valid[i] = True
+            continue
+        mol = Chem.MolFromSmiles(smiles)
+        if mol is None:
+            continue
+        fp = AllChem.GetMorganFingerprintAsBitVect(mol, ECFP4_RADIUS, nBits=ECFP4_BITS)
+        DataStructs.ConvertToNumpyArray(fp, X[i])
+        valid[i] = True
+        computed[smiles] = X[i]
+    if store is not None and computed:
+        store.put_many(computed.items())
+    return X, valid
+
+
+def predict_probabilities(models: dict, X, chunk_size=PREDICTION_CHUNK_SIZE, on_chunk=None):
+    """
+    Probability of the active class (class 1) for every row of `X`, per model.
+
+    Calls `predict_proba` once per model per chunk of rows. `on_chunk(rows_done, n_rows)`
+    is called after each chunk. Returns `{model name: float array of length n}`.
+    """
+    n_rows = X.shape[0]
+    probabilities = {name: np.empty(n_rows, dtype=float) for name in models}
+    for start in range(0, n_rows, chunk_size):
+        chunk = X[start:start + chunk_size]
+        for name, model in models.items():
+            probabilities[name][start:start + chunk.shape[0]] = model.predict_proba(chunk)[:, 1]
+        if on_chunk is not None:
+            on_chunk(min(start + chunk_size, n_rows), n_rows)
+    return probabilities
+
+
+def is_active(probabilities):
+    return np.asarray(probabilities) > ACTIVE_PROBABILITY_THRESHOLD
+
+
+def predict_smiles_table(smiles_list, models: dict, store=None, on_progress=None, ids=None, n_workers=1):
+    """
+    Standardizes, fingerprints and scores a list of SMILES against every model.
+
+    Returns `(rows, invalid_smiles)`: one results-table dict per valid molecule
+    (`ID`, `SMILES`, then `<target> Activity` / `<target> Prob` per model) and the inputs
+    that could not be standardized or fingerprinted. IDs come from `ids` (parallel to
+    `smiles_list`) or default to `Mol_<input position>`. `on_progress(fraction)` is called
+    as work advances. Inputs that standardize to the same canonical SMILES (the model's
+    actual input) are fingerprinted and scored once; every one of them still gets its own row. Large
+    inputs are standardized on up to `n_workers` processes (see `standardize_batch`).
+    """
+    n_inputs = max(1, len(smiles_list))
+    invalid_smiles = []
+    std_entries = []
+    for i, result in enumerate(standardize_batch(smiles_list, n_workers=n_workers)):
+        if result["smiles"]: std_entries.append((i, result["smiles"]))
+        else: invalid_smiles.append(result["input"])
+        if on_progress is not None:
+            on_progress(0.5 * (i + 1) / n_inputs)
+
+    groups = group_duplicates(std_entries, lambda entry: entry[1])
+    X, valid = fingerprint_matrix([group[0][1] for group in groups], store=store)
+    invalid_smiles += [smiles_list[i] for group, ok in zip(groups, valid) if not ok for i, _ in group]
+    groups = [group for group, ok in zip(groups, valid) if ok]
+    X = X[valid]
+    probabilities = predict_probabilities(
+        models, X,
+        on_chunk=(lambda done, total: on_progress(0.5 + 0.5 * done / total)) if on_progress is not None else None
+    )
+    activities = {t: is_active(p) for t, p in probabilities.items()}
+
+    # Rows in input order; duplicates read the prediction of their group's first member
+    group_of_input = {i: row_idx for row_idx, group in enumerate(groups) for i, _ in group}
+    rows = []
+    for i, std_smi in std_entries:
+        row_idx = group_of_input.get(i)
+        if row_idx is None:
+            continue
+        row = {"ID": ids[i] if ids is not None else f"Mol_{i+1}", "SMILES": std_smi}
+        for t in models:
+            row[f"{t} Activity"] = "Active 🟢" if activities[t][row_idx] else "Inactive 🔴"
+            row[f"{t} Prob"] = f"{probabilities[t][row_idx]:.2f}"
+        rows.append(row)
+    if on_progress is not None:
+        on_progress(1.0)
+    return rows, invalid_smiles
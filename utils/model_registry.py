@@ -0,0 +1,61 @@
+import os
+import threading
+from pathlib import Path
+
+from .hashing import file_sha256
+
+# Process-wide: every Streamlit session (and any other caller in this process) shares
+# the same loaded model objects.
+_models = {}
+_registry_lock = threading.Lock()
+
+
+def get_model(model_path):
+    """
+    Returns the model stored at `model_path`, loading it with joblib at most once.
+
+    The file is re-checked on every call: the model is reloaded only when the file's
+    mtime/size changed *and* its content hash differs from the loaded copy, so touching
+    or re-downloading an identical file does not trigger a reload.
+    Raises FileNotFoundError if the file does not exist.
+    """
+    import joblib
+
+    model_path = str(Path(model_path).resolve())
+    st_info = os.stat(model_path)
+    stat_key = (st_info.st_mtime_ns, st_info.st_size)
+
+    with _registry_lock:
+        entry = _models.get(model_path)
+        if entry is not None and entry["stat"] == stat_key:
+            return entry["model"]
+        digest = file_sha256(model_path)
+        if entry is not None and entry["sha256"] == digest:
+            entry["stat"] = stat_key
+            return entry["model"]
+        model = joblib.load(model_path)
+        _models[model_path] = {"model": model, "stat": stat_key, "sha256": digest}
+        return model
+
+
+def warm_up(model_paths):
+    """
+    Loads every existing model file into the registry so the first prediction does not
+    pay the load cost. Returns `{path: error message}` for files that failed to load.
+    """
+    errors = {}
+    for model_path in model_paths:
+        if not Path(model_path).exists():
+            continue
+        try:
+            get_model(model_path)
+        except Exception as e:
+            errors[str(model_path)] = str(e)
+    return errors
+
+
+def warm_up_in_background(model_paths):
+    """Runs `warm_up` on a daemon thread and returns the thread."""
+    thread = threading.Thread(target=warm_up, args=(list(model_paths),), name="model-warm-up", daemon=True)
+    thread.start()
+    return thread
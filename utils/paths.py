@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 APP_VERSION = "1.0.0" # Updated version
@@ -11,7 +12,7 @@ GH_ENSEMBLE_DOCKING_ROOT_PATH = "ensemble-docking"
 RECEPTOR_SUBDIR_GH = "ensemble_protein/"
 CONFIG_SUBDIR_GH = "config/"
 
-APP_ROOT = Path(".") # Assumes streamlit_app.py is in the root of your project
+APP_ROOT = Path(os.environ.get("GSJ_APP_ROOT", ".")) # Assumes streamlit_app.py is in the root of your project (the CLI sets its own directory)
 ENSEMBLE_DOCKING_DIR_LOCAL = APP_ROOT / "utils"
 LIGAND_PREPROCESSING_SUBDIR_LOCAL = ENSEMBLE_DOCKING_DIR_LOCAL / "ligand_preprocessing"
 SCRUB_PY_LOCAL_PATH = LIGAND_PREPROCESSING_SUBDIR_LOCAL / "scrub.py"
@@ -22,13 +23,29 @@ VINA_DIR_LOCAL = APP_ROOT / "vina"
 VINA_EXECUTABLE_NAME = "vina_1.2.7_linux_x86_64" # Ensure this matches your Vina executable
 VINA_PATH_LOCAL = VINA_DIR_LOCAL / VINA_EXECUTABLE_NAME
 
+MODELS_DIR_LOCAL = APP_ROOT / "models"
+
 WORKSPACE_PARENT_DIR = APP_ROOT / "autodock_workspace"
 RECEPTOR_DIR_LOCAL = WORKSPACE_PARENT_DIR / "fetched_receptors"
 CONFIG_DIR_LOCAL = WORKSPACE_PARENT_DIR / "fetched_configs"
+MAPS_DIR_LOCAL = WORKSPACE_PARENT_DIR / "receptor_maps" # Precomputed Vina affinity maps per (receptor, config)
+FINGERPRINT_STORE_PATH = WORKSPACE_PARENT_DIR / "fingerprints.sqlite" # ECFP4 bits keyed by canonical SMILES
 LIGAND_PREP_DIR_LOCAL = WORKSPACE_PARENT_DIR / "prepared_ligands"
-LIGAND_UPLOAD_TEMP_DIR = WORKSPACE_PARENT_DIR / "uploaded_ligands_temp"
-ZIP_EXTRACT_DIR_LOCAL = WORKSPACE_PARENT_DIR / "zip_extracted_ligands"
 DOCKING_OUTPUT_DIR_LOCAL = APP_ROOT / "autodock_outputs"
+DOCKING_CACHE_DIR_LOCAL = DOCKING_OUTPUT_DIR_LOCAL / "result_cache"
+DOCKING_CACHE_MAX_BYTES = 2 * 1024 ** 3 # Size bound for the docking result cache (LRU eviction)
+RESULTS_DB_PATH = DOCKING_OUTPUT_DIR_LOCAL / "results.sqlite" # Durable store of docking runs and scores
+SCREENING_JOURNAL_DIR_LOCAL = DOCKING_OUTPUT_DIR_LOCAL / "journals" # Checkpoints of completed (ligand, target) pairs
+SESSION_WORKSPACES_DIR_LOCAL = WORKSPACE_PARENT_DIR / "sessions" # Per-session prepared ligands and docking outputs
+WORKSPACES_MAX_BYTES = 5 * 1024 ** 3 # Disk budget for all session workspaces (LRU eviction of idle ones)
+WORKSPACE_MIN_IDLE_S = 3600 # Workspaces used more recently than this are never evicted
+ASSET_MANIFEST_PATH = WORKSPACE_PARENT_DIR / "asset_manifest.json" # SHA-256 and source of every fetched receptor, config and model
+ASSET_BASE_URL = os.environ.get("GSJ_ASSET_BASE_URL", BASE_GITHUB_URL_FOR_DATA) # Mirror or local stand-in for the data repo
+ASSET_BUNDLE_DIR = os.environ.get("GSJ_ASSET_BUNDLE_DIR") # Pre-populated targets/, configs/ and models/ tree used before the network
+ASSET_OFFLINE = os.environ.get("GSJ_OFFLINE", "") not in ("", "0") # Never download; only local files and the bundle
+ASSET_DOWNLOAD_WORKERS = 4 # Concurrent downloads (and pooled connections)
+JOBS_DIR_LOCAL = WORKSPACE_PARENT_DIR / "jobs" # Specs, status and results of background jobs
+JOB_WORKERS = 2 # Background jobs running at once (docking jobs split the CPUs between them)
 
 
 
@@ -0,0 +1,115 @@
+from pathlib import Path
+
+import numpy as np
+
+# One row per binding mode. `atom_start`/`atom_count` index into the accompanying
+# (n_atoms, 3) float32 coordinate array, so all poses of a file (or of a whole output
+# directory) share one contiguous coordinate buffer.
+POSE_DTYPE = np.dtype([
+    ("file_id", "i4"),
+    ("mode", "i4"),
+    ("affinity", "f4"),
+    ("rmsd_lb", "f4"),
+    ("rmsd_ub", "f4"),
+    ("atom_start", "i8"),
+    ("atom_count", "i4"),
+])
+
+_VINA_RESULT_PREFIX = "REMARK VINA RESULT:"
+
+
+def _parse_vina_result(line):
+    """(affinity, rmsd_lb, rmsd_ub) from a `REMARK VINA RESULT:` line, NaN where missing."""
+    values = line[len(_VINA_RESULT_PREFIX):].split()
+    parsed = []
+    for i in range(3):
+        try:
+            parsed.append(float(values[i]))
+        except (IndexError, ValueError):
+            parsed.append(np.nan)
+    return parsed
+
+
+def best_affinity(pdbqt_path) -> float | None:
+    """
+    Affinity of the first (best) binding mode in a Vina output file, or None.
+
+    Stops reading at the first `REMARK VINA RESULT` line.
+    """
+    try:
+        with open(pdbqt_path, 'r') as f:
+            for line in f:
+                if line.upper().startswith(_VINA_RESULT_PREFIX):
+                    affinity = _parse_vina_result(line)[0]
+                    return None if np.isnan(affinity) else affinity
+    except (OSError, UnicodeDecodeError):
+        pass
+    return None
+
+
+def _parse_into(pdbqt_path, file_id, pose_rows, coords, atom_offset):
+    """Streams one file, appending pose tuples and coordinate triples. Returns the new atom offset."""
+    mode = 0
+    result = (np.nan, np.nan, np.nan)
+    atom_start = atom_offset
+    in_pose = False
+    with open(pdbqt_path, 'r') as f:
+        for line in f:
+            if line.startswith("MODEL"):
+                mode += 1
+                result = (np.nan, np.nan, np.nan)
+                atom_start = atom_offset
+                in_pose = True
+            elif line.startswith("ATOM") or line.startswith("HETATM"):
+                coords.append((float(line[30:38]), float(line[38:46]), float(line[46:54])))
+                atom_offset += 1
+                in_pose = True
+            elif line.upper().startswith(_VINA_RESULT_PREFIX):
+                result = _parse_vina_result(line)
+            elif line.startswith("ENDMDL"):
+                pose_rows.append((file_id, mode, *result, atom_start, atom_offset - atom_start))
+                in_pose = False
+    # Single-pose files without MODEL/ENDMDL records
+    if in_pose and atom_offset > atom_start:
+        pose_rows.append((file_id, max(mode, 1), *result, atom_start, atom_offset - atom_start))
+    return atom_offset
+
+
+def parse_pdbqt_poses(pdbqt_path):
+    """
+    Every binding mode of a Vina output file.
+
+    Returns `(poses, coords)`: a `POSE_DTYPE` structured array with one row per mode
+    (affinity, RMSD lower/upper bound, slice into `coords`) and an `(n_atoms, 3)`
+    float32 array of atom coordinates.
+    """
+    pose_rows, coords = [], []
+    _parse_into(pdbqt_path, 0, pose_rows, coords, 0)
+    return np.array(pose_rows, dtype=POSE_DTYPE), np.array(coords, dtype=np.float32).reshape(-1, 3)
+
+
+def parse_pdbqt_directory(directory, pattern="*_out.pdbqt"):
+    """
+    Parses every Vina output in `directory` matching `pattern` into one pose table.
+
+    Returns `(files, poses, coords)`, where `poses["file_id"]` indexes `files`. Files that
+    cannot be read are skipped.
+    """
+    files, pose_rows, coords = [], [], []
+    atom_offset = 0
+    for path in sorted(Path(directory).glob(pattern)):
+        n_rows, n_coords = len(pose_rows), len(coords)
+        try:
+            atom_offset = _parse_into(path, len(files), pose_rows, coords, atom_offset)
+        except (OSError, ValueError, UnicodeDecodeError):
+            del pose_rows[n_rows:], coords[n_coords:]
+            atom_offset = n_coords
+            continue
+        files.append(path)
+    return files, np.array(pose_rows, dtype=POSE_DTYPE), np.array(coords, dtype=np.float32).reshape(-1, 3)
+
+
+def pose_coordinates(poses, coords, index):
+    """Coordinates of pose `index` as an (n, 3) view into `coords`."""
+    row = poses[index]
+    return coords[row["atom_start"]:row["atom_start"] + row["atom_count"]]
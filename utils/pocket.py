@@ -0,0 +1,92 @@
+import functools
+
+import numpy as np
+
+from .hashing import file_sha256
+
+DEFAULT_POCKET_RADIUS = 8.0
+
+
+def _atom_lines(path):
+    """ATOM/HETATM lines of a PDB/PDBQT file (first MODEL only)."""
+    lines = []
+    with open(path, 'r') as f:
+        for line in f:
+            if line.startswith("ENDMDL"):
+                break
+            if line.startswith(("ATOM", "HETATM")):
+                lines.append(line)
+    return lines
+
+
+def _coordinates(lines):
+    return np.array([(float(l[30:38]), float(l[38:46]), float(l[46:54])) for l in lines], dtype=np.float32).reshape(-1, 3)
+
+
+def _to_pdb(lines):
+    # PDBQT appends charge/atom type after column 66; cutting there leaves valid PDB records
+    return "".join(line[:66].rstrip() + "\n" for line in lines) + "END\n"
+
+
+@functools.lru_cache(maxsize=8)
+def _receptor_index(digest, receptor_path):
+    from scipy.spatial import cKDTree
+
+    lines = _atom_lines(receptor_path)
+    # Residue = (name, chain, number, insertion code); atoms of a residue are contiguous
+    residue_keys = [line[17:27] for line in lines]
+    residue_ids = np.zeros(len(lines), dtype=np.int32)
+    for i in range(1, len(lines)):
+        residue_ids[i] = residue_ids[i - 1] + (residue_keys[i] != residue_keys[i - 1])
+    return {"lines": lines, "residue_ids": residue_ids, "tree": cKDTree(_coordinates(lines))}
+
+
+def receptor_index(receptor_path):
+    """
+    Parsed receptor atoms with a KD-tree over their coordinates.
+
+    Cached by file content hash, so every pose rendered against a receptor reuses the
+    same index and an edited or re-downloaded receptor is re-indexed.
+    """
+    return _receptor_index(file_sha256(receptor_path), str(receptor_path))
+
+
+@functools.lru_cache(maxsize=64)
+def _pocket_complex(receptor_digest, receptor_path, ligand_digest, ligand_path, radius):
+    index = _receptor_index(receptor_digest, receptor_path)
+    ligand_lines = _atom_lines(ligand_path)
+    hits = index["tree"].query_ball_point(_coordinates(ligand_lines), r=radius)
+    atoms = np.unique(np.concatenate([np.asarray(h, dtype=np.int64) for h in hits])) if len(hits) else np.empty(0, np.int64)
+    # Keep whole residues so side chains are not cut in half
+    residues = np.unique(index["residue_ids"][atoms])
+    selected = np.flatnonzero(np.isin(index["residue_ids"], residues))
+    return {
+        "receptor_pdb": _to_pdb([index["lines"][i] for i in selected]),
+        "ligand_pdb": _to_pdb(ligand_lines),
+        "n_residues": int(len(residues)),
+        "n_atoms": int(len(selected)),
+    }
+
+
+def pocket_complex(receptor_path, ligand_path, radius: float = DEFAULT_POCKET_RADIUS) -> dict:
+    """
+    Receptor residues with any atom within `radius` Å of the ligand pose, as PDB text.
+
+    `ligand_path` is a single-pose PDB/PDBQT file (only its first MODEL is used). Returns
+    `{"receptor_pdb", "ligand_pdb", "n_residues", "n_atoms"}`; results are cached by the
+    content hashes of both files and the radius.
+    """
+    return _pocket_complex(
+        file_sha256(receptor_path), str(receptor_path),
+        file_sha256(ligand_path), str(ligand_path), round(float(radius), 2)
+    )
+
+
+@functools.lru_cache(maxsize=4)
+def _receptor_pdb(digest, receptor_path):
+    return _to_pdb(_receptor_index(digest, receptor_path)["lines"])
+
+
+def receptor_pdb(receptor_path) -> str:
+    """The whole receptor as PDB text, cached by file content hash."""
+    return _receptor_pdb(file_sha256(receptor_path), str(receptor_path))
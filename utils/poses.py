@@ -0,0 +1,93 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+from .hashing import file_sha256
+
+# Process-wide: (poses root, output file content hash) -> list of pose records.
+_extracted = {}
+_extract_lock = threading.Lock()
+
+_MANIFEST = "poses.json"
+
+
+def _split_models(output_path, prefix):
+    """Writes each MODEL of a Vina output to `<prefix><mode>.pdbqt` (the same content vina_split writes)."""
+    mode, block = 0, None
+    with open(output_path, 'r') as f:
+        for line in f:
+            if line.startswith("MODEL"):
+                mode, block = mode + 1, []
+            elif line.startswith("ENDMDL"):
+                if block is not None:
+                    Path(f"{prefix}{mode}.pdbqt").write_text("".join(block))
+                block = None
+            elif block is not None:
+                block.append(line)
+
+
+def _build_pose_dir(output_path, pose_dir: Path):
+    """Splits `output_path` into `pose_dir` (built aside and renamed into place) with a manifest."""
+    from .pdbqt_parser import parse_pdbqt_poses
+
+    poses, _ = parse_pdbqt_poses(output_path)
+    pose_dir.parent.mkdir(parents=True, exist_ok=True)
+    build_dir = Path(tempfile.mkdtemp(dir=pose_dir.parent, prefix=f".{pose_dir.name}_"))
+    try:
+        _split_models(output_path, build_dir / "pose_")
+        expected = [build_dir / f"pose_{int(mode)}.pdbqt" for mode in poses["mode"]]
+        records = [
+            # Vina reports 3 decimals; round away the float32 noise from the pose table
+            {"mode": int(pose["mode"]), "affinity": round(float(pose["affinity"]), 3),
+             "rmsd_lb": round(float(pose["rmsd_lb"]), 3), "rmsd_ub": round(float(pose["rmsd_ub"]), 3), "file": path.name}
+            for pose, path in zip(poses, expected) if path.exists()
+        ]
+        with open(build_dir / _MANIFEST, 'w') as f:
+            json.dump(records, f)
+        try:
+            os.rename(build_dir, pose_dir)
+        except OSError:
+            # Another process extracted the same file first; its copy is identical
+            pass
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+
+def _load_manifest(pose_dir: Path):
+    try:
+        with open(pose_dir / _MANIFEST, 'r') as f:
+            records = json.load(f)
+    except (OSError, ValueError):
+        return None
+    for record in records:
+        record["path"] = str(pose_dir / record["file"])
+    if not all(os.path.exists(record["path"]) for record in records):
+        return None
+    return records
+
+
+def extract_poses(output_path, poses_root) -> list[dict]:
+    """
+    Every binding mode of a Vina output file, each as its own single-pose PDBQT file.
+
+    Returns one dict per mode with `mode`, `affinity`, `rmsd_lb`, `rmsd_ub` and `path`.
+    Splitting happens once per output *content*: poses are written to
+    `poses_root/<content hash>/` and memoized in memory, so switching between poses or
+    re-rendering never re-parses the output.
+    """
+    digest = file_sha256(output_path)
+    pose_dir = Path(poses_root) / digest[:16]
+    with _extract_lock:
+        records = _extracted.get((str(poses_root), digest))
+        if records is not None and all(os.path.exists(r["path"]) for r in records):
+            return [dict(r) for r in records]
+        records = _load_manifest(pose_dir)
+        if records is None:
+            shutil.rmtree(pose_dir, ignore_errors=True)
+            _build_pose_dir(output_path, pose_dir)
+            records = _load_manifest(pose_dir) or []
+        _extracted[(str(poses_root), digest)] = records
+        return [dict(r) for r in records]
@@ -0,0 +1,166 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    ligands TEXT NOT NULL,
+    targets TEXT NOT NULL,
+    label TEXT
+);
+CREATE TABLE IF NOT EXISTS docking_results (
+    run_id TEXT NOT NULL REFERENCES runs(run_id),
+    ligand TEXT NOT NULL,
+    target TEXT NOT NULL,
+    pose INTEGER NOT NULL,
+    score REAL,
+    rmsd_lb REAL,
+    rmsd_ub REAL,
+    status TEXT NOT NULL,
+    output_path TEXT,
+    elapsed_s REAL,
+    from_cache INTEGER NOT NULL DEFAULT 0,
+    recorded_at REAL NOT NULL,
+    PRIMARY KEY (run_id, ligand, target, pose)
+);
+CREATE INDEX IF NOT EXISTS idx_results_target_score ON docking_results (target, pose, score);
+"""
+
+
+class ResultsStore:
+    """
+    SQLite store of docking runs and their per-pose results.
+
+    Every finished (ligand, target) pair is written as soon as it is known, one row per
+    binding mode (pose 1 is the best). Failed pairs get a single pose-0 row whose status
+    is the error marker shown in the results table ("Error" / "N/A").
+    """
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def start_run(self, ligands, targets, label=None, run_id=None) -> str:
+        """Opens a run (or reopens an existing `run_id`, keeping its recorded results)."""
+        run_id = run_id or uuid.uuid4().hex[:12]
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO runs (run_id, started_at, ligands, targets, label) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT(run_id) DO UPDATE SET ligands = excluded.ligands, targets = excluded.targets,"
+                " finished_at = NULL",
+                (run_id, time.time(), json.dumps(list(ligands)), json.dumps(list(targets)), label)
+            )
+        return run_id
+
+    def finish_run(self, run_id):
+        with self._connect() as conn:
+            conn.execute("UPDATE runs SET finished_at = ? WHERE run_id = ?", (time.time(), run_id))
+
+    def record_result(self, run_id, ligand, target, score, output_path=None, elapsed_s=None, from_cache=False):
+        """Stores all binding modes of one finished pair (or its error status)."""
+        # Imported here so listing and reading runs does not load numpy
+        from .pdbqt_parser import parse_pdbqt_poses
+
+        now = time.time()
+        rows = []
+        if isinstance(score, (int, float)) and output_path is not None:
+            try:
+                poses, _ = parse_pdbqt_poses(output_path)
+            except (OSError, ValueError):
+                poses = []
+            for pose in poses:
+                # Vina reports 3 decimals; round away the float32 noise from the pose table
+                rows.append((run_id, ligand, target, int(pose["mode"]), round(float(pose["affinity"]), 3),
+                             round(float(pose["rmsd_lb"]), 3), round(float(pose["rmsd_ub"]), 3), "ok", str(output_path),
+                             elapsed_s, int(from_cache), now))
+            if not rows:
+                rows.append((run_id, ligand, target, 1, float(score), 0.0, 0.0, "ok", str(output_path),
+                             elapsed_s, int(from_cache), now))
+        else:
+            rows.append((run_id, ligand, target, 0, None, None, None, str(score),
+                         str(output_path) if output_path else None, elapsed_s, int(from_cache), now))
+        with self._connect() as conn:
+            conn.execute("DELETE FROM docking_results WHERE run_id = ? AND ligand = ? AND target = ?",
+                         (run_id, ligand, target))
+            conn.executemany(
+                "INSERT INTO docking_results (run_id, ligand, target, pose, score, rmsd_lb, rmsd_ub, status,"
+                " output_path, elapsed_s, from_cache, recorded_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def list_runs(self, limit=50):
+        """Most recent runs first, with the number of pairs recorded so far."""
+        query = """
+            SELECT r.run_id, r.started_at, r.finished_at, r.ligands, r.targets, r.label,
+                   (SELECT COUNT(DISTINCT d.ligand || char(0) || d.target) FROM docking_results d WHERE d.run_id = r.run_id)
+            FROM runs r ORDER BY r.started_at DESC LIMIT ?
+        """
+        runs = []
+        for run_id, started_at, finished_at, ligands, targets, label, n_pairs in self._connect().execute(query, (limit,)):
+            runs.append({
+                "run_id": run_id, "started_at": started_at, "finished_at": finished_at,
+                "ligands": json.loads(ligands), "targets": json.loads(targets),
+                "label": label, "n_pairs": n_pairs,
+            })
+        return runs
+
+    def run_results_table(self, run_id):
+        """
+        Best score per (ligand, target) of a run in the `docking_results` session format:
+        one dict per ligand with a `Ligand` key and one key per target.
+        """
+        conn = self._connect()
+        run = conn.execute("SELECT ligands, targets FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        if run is None:
+            return []
+        ligands, targets = json.loads(run[0]), json.loads(run[1])
+        rows = {ligand: {"Ligand": ligand} for ligand in ligands}
+        for ligand, target, pose, score, status in conn.execute(
+            "SELECT ligand, target, pose, score, status FROM docking_results WHERE run_id = ? AND pose <= 1",
+            (run_id,)
+        ):
+            rows.setdefault(ligand, {"Ligand": ligand})[target] = score if pose == 1 else status
+        return [{"Ligand": row["Ligand"], **{t: row.get(t, "N/A") for t in targets}} for row in rows.values()]
+
+    def output_path(self, run_id, ligand, target) -> str | None:
+        """Vina output file recorded for a (ligand, target) pair of a run, or None."""
+        row = self._connect().execute(
+            "SELECT output_path FROM docking_results WHERE run_id = ? AND ligand = ? AND target = ? AND output_path IS NOT NULL"
+            " ORDER BY pose LIMIT 1",
+            (run_id, ligand, target)
+        ).fetchone()
+        return row[0] if row else None
+
+    def top_n_per_target(self, n=10, run_id=None):
+        """Best-scoring ligands per target (pose 1 only), optionally within one run."""
+        query = """
+            SELECT target, ligand, score, run_id FROM (
+                SELECT target, ligand, score, run_id,
+                       ROW_NUMBER() OVER (PARTITION BY target ORDER BY score ASC) AS rank
+                FROM docking_results
+                WHERE pose = 1 AND score IS NOT NULL AND (? IS NULL OR run_id = ?)
+            ) WHERE rank <= ? ORDER BY target, score
+        """
+        return [
+            {"Target": target, "Ligand": ligand, "Score": score, "Run": rid}
+            for target, ligand, score, rid in self._connect().execute(query, (run_id, run_id, n))
+        ]
@@ -0,0 +1,140 @@
+import os
+import shutil
+from pathlib import Path
+
+from .docking import plan_batches, plan_cpu_allocation, dock_grid, vina_version
+from .pdbqt_parser import best_affinity
+from .docking_cache import DockingResultCache, link_or_copy
+from .affinity_maps import ensure_affinity_maps
+from .ligand_identity import group_duplicates, ligand_file_identity
+from .screening_journal import ScreeningJournal
+
+
+def run_screening(jobs, vina_path, exhaustiveness, batch_mode=True, cache: DockingResultCache | None = None,
+                  search_params=None, on_plan=None, maps_dir=None, journal: ScreeningJournal | None = None,
+                  total_cpus: int | None = None, dedupe: bool = True):
+    """
+    Docks every (ligand, target) job, serving repeats from the result cache.
+
+    With `maps_dir`, each target's affinity maps are precomputed once (or reused from
+    `maps_dir`) and loaded by Vina instead of rebuilding the grid for every run. With a
+    `journal`, pairs it already records as docked (and whose output file still exists)
+    are skipped, their recorded output linked to the job's `output_path` if that differs
+    (e.g. a new session workspace), and every newly resolved pair is appended to it. With `dedupe`, jobs
+    whose ligand files hold the same compound (by InChIKey, see `ligand_file_identity`)
+    against the same receptor and config are docked once and the output file is copied
+    to the others.
+
+    Yields `(job, score, source)` as each job is resolved, where `score` is the best
+    affinity, "N/A" if Vina produced an unreadable output, or "Error", and `source` is
+    "journal", "cache", "vina" or "duplicate". Journal and cache hits are yielded first, before any
+    Vina process starts. `on_plan(n_workers, cpu_per_job, n_to_dock)` is called once the
+    remaining jobs have been scheduled. `total_cpus` caps the cores Vina may use
+    (defaults to every core available to this process).
+    """
+    if maps_dir is not None:
+        search_params = {**(search_params or {}), "maps": True}
+
+    if journal is not None:
+        done = journal.completed()
+        remaining = []
+        for job in jobs:
+            entry = done.get((job["ligand_name"], job["target_name"]))
+            if entry is not None and isinstance(entry["score"], (int, float)) and _restore_output(job, entry["output"]):
+                yield job, entry["score"], "journal"
+            else:
+                remaining.append(job)
+        jobs = remaining
+    duplicates = {}
+    if dedupe and len(jobs) > 1:
+        jobs, duplicates = _collapse_duplicates(jobs)
+    for job, score, source in _resolve_jobs(jobs, vina_path, exhaustiveness, batch_mode, cache,
+                                            search_params, on_plan, maps_dir, total_cpus):
+        if journal is not None:
+            journal.record(job["ligand_name"], job["target_name"], score, job["output_path"])
+        yield job, score, source
+        for duplicate in duplicates.get(id(job), ()):
+            _copy_output(job, duplicate, score)
+            if journal is not None:
+                journal.record(duplicate["ligand_name"], duplicate["target_name"], score, duplicate["output_path"])
+            yield duplicate, score, "duplicate"
+
+
+def _restore_output(job, recorded_output) -> bool:
+    """Makes the journaled output of a pair available at `job["output_path"]`. Returns False if it is gone."""
+    dst = Path(job["output_path"])
+    if dst.exists():
+        return True
+    try:
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        link_or_copy(recorded_output, dst)
+    except OSError:
+        return False
+    return True
+
+
+def _collapse_duplicates(jobs):
+    """One job per (compound, receptor, config); returns `(jobs, {id(kept job): [other jobs]})`."""
+    def identity(job):
+        try:
+            return ligand_file_identity(job["ligand_path"]), str(job["receptor_path"]), str(job["config_path"])
+        except OSError:
+            return None
+
+    groups = group_duplicates(jobs, identity)
+    return [group[0] for group in groups], {id(group[0]): group[1:] for group in groups if len(group) > 1}
+
+
+def _copy_output(job, duplicate, score):
+    src, dst = Path(job["output_path"]), Path(duplicate["output_path"])
+    if score == "Error" or not src.exists() or src == dst:
+        return
+    tmp_path = dst.with_name(f".{dst.name}.{os.getpid()}.tmp")
+    shutil.copyfile(src, tmp_path)
+    os.replace(tmp_path, dst)
+
+
+def _resolve_jobs(jobs, vina_path, exhaustiveness, batch_mode, cache, search_params, on_plan, maps_dir, total_cpus):
+    pending = []
+    if cache is not None:
+        version = vina_version(vina_path)
+        for job in jobs:
+            job["cache_key"] = cache.make_key(
+                job["receptor_path"], job["config_path"], job["ligand_path"], version, search_params
+            )
+            score = cache.get(job["cache_key"], job["output_path"])
+            if score is not None:
+                yield job, score, "cache"
+            else:
+                pending.append(job)
+    else:
+        pending = list(jobs)
+
+    if not pending:
+        return
+    if maps_dir is not None:
+        prefixes = {}
+        for job in pending:
+            target_files = (str(job["receptor_path"]), str(job["config_path"]))
+            if target_files not in prefixes:
+                prefixes[target_files] = ensure_affinity_maps(vina_path, *target_files, maps_dir)
+            job["maps_prefix"] = prefixes[target_files]
+    if batch_mode:
+        batches, n_workers, cpu_per_job = plan_batches(pending, exhaustiveness, total_cpus)
+    else:
+        batches = None
+        n_workers, cpu_per_job = plan_cpu_allocation(len(pending), exhaustiveness, total_cpus)
+    if on_plan is not None:
+        on_plan(n_workers, cpu_per_job, len(pending))
+
+    for job, ret_code, stdout, stderr in dock_grid(pending, vina_path, n_workers, cpu_per_job, batches):
+        out_path = job["output_path"]
+        if ret_code == 0 and out_path.exists():
+            score = best_affinity(out_path)
+            if score is None:
+                score = "N/A"
+            elif cache is not None:
+                cache.put(job["cache_key"], out_path, score)
+        else:
+            score = "Error"
+        yield job, score, "vina"
@@ -0,0 +1,80 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from .hashing import file_sha256
+
+
+def screening_run_key(jobs, search_params=None) -> str:
+    """
+    Identifies a screen by its inputs: every job's ligand, receptor and config contents,
+    its output name, and the search parameters. Rerunning the same inputs gives the
+    same key, so the run can pick up its journal.
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps(search_params or {}, sort_keys=True).encode('utf-8'))
+    for job in sorted(jobs, key=lambda j: (str(j["ligand_name"]), str(j["target_name"]))):
+        h.update(json.dumps([
+            job["ligand_name"], job["target_name"], Path(job["output_path"]).name,
+            file_sha256(job["ligand_path"]), file_sha256(job["receptor_path"]), file_sha256(job["config_path"]),
+        ]).encode('utf-8'))
+    return h.hexdigest()[:16]
+
+
+class ScreeningJournal:
+    """
+    Append-only JSON-lines log of (ligand, target) pairs a screen has finished.
+
+    Each line is written and flushed as soon as a pair completes, so a Streamlit rerun or
+    a server restart loses at most the pairs still in flight. A truncated last line
+    (from a crash mid-write) is ignored on reload.
+    """
+
+    def __init__(self, journal_dir, run_key):
+        self.run_key = run_key
+        self.path = Path(journal_dir) / f"{run_key}.jsonl"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = None
+
+    def completed(self) -> dict:
+        """`{(ligand, target): entry}` for every recorded pair (the last record wins)."""
+        entries = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        entries[(entry["ligand"], entry["target"])] = entry
+                    except (ValueError, KeyError):
+                        continue
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def record(self, ligand, target, score, output_path):
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(json.dumps({
+            "ligand": ligand, "target": target, "score": score, "output": str(output_path)
+        }) + "\n")
+        self._file.flush()
+
+    def reset(self):
+        """Forgets all recorded pairs (start the screen over)."""
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
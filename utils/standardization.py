@@ -0,0 +1,120 @@
+import functools
+import multiprocessing
+
+from rdkit import Chem
+from rdkit.Chem.MolStandardize import rdMolStandardize
+
+# Below this many SMILES per worker, starting a process pool costs more than it saves.
+PARALLEL_MIN_PER_WORKER = 2000
+
+
+class SmilesStandardizer:
+    """
+    Standardizes SMILES (sanitize, neutralize, reionize, disconnect metals, keep the
+    parent fragment) to canonical SMILES.
+
+    The RDKit `Uncharger`, `Reionizer`, `MetalDisconnector`, `Normalizer` and
+    `LargestFragmentChooser` are built once per standardizer and reused for every
+    molecule. Nothing is reported through the UI.
+    """
+
+    def __init__(self, isomeric: bool = False):
+        self.isomeric = isomeric
+        self.uncharger = rdMolStandardize.Uncharger()
+        self.reionizer = rdMolStandardize.Reionizer()
+        self.metal_disconnector = rdMolStandardize.MetalDisconnector()
+        self.normalizer = rdMolStandardize.Normalizer()
+        self.fragment_chooser = rdMolStandardize.LargestFragmentChooser()
+
+    def standardize(self, smiles):
+        """Standardized canonical SMILES, or None if RDKit cannot parse the input. Other RDKit errors propagate."""
+        mol = Chem.MolFromSmiles(smiles)
+        if mol is None:
+            return None
+
+        Chem.SanitizeMol(mol)
+        Chem.Kekulize(mol)
+        mol = Chem.RemoveHs(mol)
+
+        mol = self.uncharger.uncharge(mol)
+        mol = self.reionizer.reionize(mol)
+        mol = self.metal_disconnector.Disconnect(mol)
+
+        mol = self._fragment_parent(mol)
+        Chem.AssignStereochemistry(mol, force=True, cleanIt=True)
+        return Chem.MolToSmiles(mol, canonical=True, isomericSmiles=self.isomeric)
+
+    def _fragment_parent(self, mol):
+        # Same steps as rdMolStandardize.FragmentParent (cleanup, then the largest
+        # fragment), which would otherwise rebuild all of its helpers on every call
+        mol = Chem.RemoveHs(mol)
+        mol = self.metal_disconnector.Disconnect(mol)
+        mol = self.normalizer.normalize(mol)
+        mol = self.reionizer.reionize(mol)
+        Chem.AssignStereochemistry(mol)
+        return self.fragment_chooser.choose(mol)
+
+    def result(self, smiles) -> dict:
+        """`{"input", "smiles", "error"}`: the standardized SMILES, or None and the reason it failed."""
+        try:
+            std_smiles = self.standardize(smiles)
+        except Exception as e:
+            return {"input": smiles, "smiles": None, "error": str(e) or type(e).__name__}
+        if not std_smiles:
+            return {"input": smiles, "smiles": None, "error": "RDKit could not parse the SMILES"}
+        return {"input": smiles, "smiles": std_smiles, "error": None}
+
+
+@functools.lru_cache(maxsize=2)
+def get_standardizer(isomeric: bool = False) -> SmilesStandardizer:
+    """Shared `SmilesStandardizer` per option, built on first use."""
+    return SmilesStandardizer(isomeric)
+
+
+def standardize_smiles(smiles, isomeric: bool = False):
+    """
+    Standardized canonical SMILES (sanitize, neutralize, reionize, disconnect metals,
+    keep the parent fragment), or None if RDKit cannot parse the input.
+
+    Stereochemistry is dropped unless `isomeric` is True. Other RDKit errors propagate
+    to the caller; nothing is reported through the UI.
+    """
+    return get_standardizer(isomeric).standardize(smiles)
+
+
+# Per-worker standardizer, built once by the pool initializer
+_worker_standardizer = None
+
+
+def _init_worker(isomeric):
+    global _worker_standardizer
+    _worker_standardizer = SmilesStandardizer(isomeric)
+
+
+def _standardize_chunk(chunk):
+    return [_worker_standardizer.result(smiles) for smiles in chunk]
+
+
+def standardize_batch(smiles_list, n_workers: int = 1, isomeric: bool = False, chunksize: int = 500):
+    """
+    Standardizes many SMILES, yielding one `SmilesStandardizer.result` dict per input in
+    input order.
+
+    With `n_workers` > 1 and enough input (`PARALLEL_MIN_PER_WORKER` SMILES per worker),
+    chunks of `chunksize` SMILES are standardized on a process pool; smaller batches run
+    in this process.
+    """
+    smiles_list = list(smiles_list)
+    n_workers = min(n_workers, len(smiles_list) // PARALLEL_MIN_PER_WORKER)
+    if n_workers <= 1:
+        standardizer = get_standardizer(isomeric)
+        for smiles in smiles_list:
+            yield standardizer.result(smiles)
+        return
+
+    chunks = (smiles_list[i:i + chunksize] for i in range(0, len(smiles_list), chunksize))
+    # "spawn" keeps workers independent of the (multi-threaded) web server process
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(n_workers, initializer=_init_worker, initargs=(bool(isomeric),)) as pool:
+        for results in pool.imap(_standardize_chunk, chunks):
+            yield from results
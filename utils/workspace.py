@@ -0,0 +1,191 @@
+import contextlib
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+
+# Touched on every use of a workspace; its mtime is the workspace's last use.
+_LAST_USED_MARKER = ".last_used"
+# `.pin.<pid>.<token>` files keep a workspace from eviction while their process is alive.
+_PIN_PREFIX = ".pin."
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _dir_size(path) -> int:
+    total = 0
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        total += _dir_size(entry.path)
+                    else:
+                        total += entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return total
+
+
+class Workspace:
+    """
+    Private directory of one session: its prepared ligands, docking outputs and the poses
+    extracted from them.
+
+    Shared, content-keyed data (receptors, configs, affinity maps, the docking result
+    cache) stays in the global directories of `paths.py`.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.ligand_dir = self.path / "prepared_ligands"
+        self.output_dir = self.path / "docking_outputs"
+        self.poses_dir = self.path / "poses"
+        self.ligand_index_path = self.path / "ligand_index.sqlite"
+
+    def create(self):
+        self.ligand_dir.mkdir(parents=True, exist_ok=True)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.touch()
+        return self
+
+    def touch(self):
+        """Marks the workspace as just used, so it is the last candidate for eviction."""
+        marker = self.path / _LAST_USED_MARKER
+        try:
+            os.utime(marker)
+        except FileNotFoundError:
+            marker.touch()
+
+    def pin(self, token: str | None = None) -> Path:
+        """
+        Protects the workspace from eviction until `unpin`, or until this process exits
+        (pins of dead processes are ignored). Returns the pin to pass to `unpin`.
+        """
+        self.create()
+        pin_path = self.path / f"{_PIN_PREFIX}{os.getpid()}.{token or uuid.uuid4().hex[:12]}"
+        pin_path.touch()
+        return pin_path
+
+    def unpin(self, pin_path):
+        Path(pin_path).unlink(missing_ok=True)
+        if self.path.exists():
+            self.touch()
+
+    @contextlib.contextmanager
+    def pinned(self):
+        """Keeps the workspace from eviction while the block runs, however long that takes."""
+        pin_path = self.pin()
+        try:
+            yield self
+        finally:
+            self.unpin(pin_path)
+
+    def is_pinned(self) -> bool:
+        """True if a live process holds a pin; pins left by dead processes are removed."""
+        try:
+            entries = list(os.scandir(self.path))
+        except OSError:
+            return False
+        pinned = False
+        for entry in entries:
+            if not entry.name.startswith(_PIN_PREFIX):
+                continue
+            try:
+                pid = int(entry.name[len(_PIN_PREFIX):].split(".")[0])
+            except ValueError:
+                continue
+            if pid_alive(pid):
+                pinned = True
+            else:
+                try:
+                    os.unlink(entry.path)
+                except OSError:
+                    pass
+        return pinned
+
+    def last_used(self) -> float:
+        try:
+            return (self.path / _LAST_USED_MARKER).stat().st_mtime
+        except OSError:
+            return 0.0
+
+
+class WorkspaceManager:
+    """
+    Per-session workspaces under `root`, held to a disk budget.
+
+    Once all workspaces together exceed `max_bytes`, whole workspaces are deleted least
+    recently used first. Workspaces used within the last `min_idle_s` seconds (an open
+    session) or pinned by a live process (a screen or background job still running, see
+    `Workspace.pinned`) are never deleted, even over budget. A daemon thread sweeps
+    every `sweep_interval_s` seconds; `evict` can also be called directly.
+    """
+
+    def __init__(self, root, max_bytes, min_idle_s: float = 3600, sweep_interval_s: float = 300):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.min_idle_s = min_idle_s
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sweeper = None
+        if sweep_interval_s:
+            self._sweeper = threading.Thread(target=self._sweep, args=(sweep_interval_s,), name="workspace-sweeper", daemon=True)
+            self._sweeper.start()
+
+    def get(self, workspace_id: str) -> Workspace:
+        """The workspace `workspace_id`, created if needed (again, if it was evicted) and marked as used."""
+        return Workspace(self.root / workspace_id).create()
+
+    def _workspaces(self):
+        try:
+            entries = list(os.scandir(self.root))
+        except OSError:
+            return []
+        return [Workspace(entry.path) for entry in entries if entry.is_dir(follow_symlinks=False)]
+
+    def usage(self) -> int:
+        """Bytes used by all workspaces."""
+        return sum(_dir_size(ws.path) for ws in self._workspaces())
+
+    def evict(self) -> list[str]:
+        """Deletes least recently used idle workspaces until the total fits in `max_bytes`. Returns their ids."""
+        with self._lock:
+            workspaces = [(ws.last_used(), _dir_size(ws.path), ws) for ws in self._workspaces()]
+            total = sum(size for _, size, _ in workspaces)
+            cutoff = time.time() - self.min_idle_s
+            evicted = []
+            for last_used, size, ws in sorted(workspaces, key=lambda item: item[0]):
+                if total <= self.max_bytes or last_used > cutoff:
+                    break
+                if ws.is_pinned() or ws.last_used() > cutoff:
+                    # In use, or its session came back while the sizes were being summed
+                    continue
+                shutil.rmtree(ws.path, ignore_errors=True)
+                total -= size
+                evicted.append(ws.path.name)
+            return evicted
+
+    def _sweep(self, interval_s):
+        while not self._stop.wait(interval_s):
+            try:
+                self.evict()
+            except Exception:
+                # A failed sweep is retried at the next interval; it must not kill the thread
+                pass
+
+    def close(self):
+        self._stop.set()